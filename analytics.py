@@ -0,0 +1,159 @@
+# analytics.py
+
+from datetime import datetime
+
+
+class RollingWindow:
+
+    # Fixed-size ring over the last `size` values with a running sum, so
+    # push() and mean() are O(1) no matter how long the session runs
+
+    def __init__(self, size):
+        self.size = size
+        self.values = [0.0] * size
+        self.index = 0
+        self.count = 0
+        self.total = 0.0
+
+    def push(self, value):
+        if self.count == self.size:
+            self.total -= self.values[self.index]
+        else:
+            self.count += 1
+
+        self.values[self.index] = value
+        self.total += value
+        self.index = (self.index + 1) % self.size
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class WeaponStats:
+
+    def __init__(self):
+        self.matches = 0
+        self.extracts = 0
+        self.cost = 0.0
+        self.loot = 0.0
+
+    def extract_rate(self):
+        return self.extracts / self.matches if self.matches else 0.0
+
+    def roi(self):
+        # Return on the loadouts taken in with this weapon
+        return (self.loot - self.cost) / self.cost if self.cost else 0.0
+
+
+class SessionAnalytics:
+
+    # Live session stats for the overlay. Every add() updates running
+    # totals, the last-N rolling windows, the per-weapon accumulators and
+    # the streak counters in O(1); snapshot() only reads them.
+
+    ROLLING_WINDOW = 20
+    # Weapons with fewer matches are not ranked
+    MIN_WEAPON_MATCHES = 3
+
+    def __init__(self, window=ROLLING_WINDOW):
+        self.window = window
+        self.reset()
+
+    def reset(self, started_at=None):
+        self.started_at = started_at
+
+        self.matches = 0
+        self.extracts = 0
+        self.deaths = 0
+        self.profit = 0.0
+        self.kills = 0
+
+        self.recent_profit = RollingWindow(self.window)
+        self.recent_kills = RollingWindow(self.window)
+        self.recent_extracts = RollingWindow(self.window)
+
+        self.weapons = {}
+
+        # > 0: extracts in a row, < 0: deaths in a row
+        self.streak = 0
+        self.best_streak = 0
+        self.worst_streak = 0
+
+    def add(self, cost, loot_value, kills, weapon, at=None):
+        at = at or datetime.now()
+        if self.started_at is None:
+            self.started_at = at
+
+        profit = loot_value - cost
+        extracted = loot_value != 0
+
+        self.matches += 1
+        self.profit += profit
+        self.kills += kills
+
+        if extracted:
+            self.extracts += 1
+            self.streak = self.streak + 1 if self.streak > 0 else 1
+        else:
+            self.deaths += 1
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+
+        self.best_streak = max(self.best_streak, self.streak)
+        self.worst_streak = min(self.worst_streak, self.streak)
+
+        self.recent_profit.push(profit)
+        self.recent_kills.push(kills)
+        self.recent_extracts.push(1.0 if extracted else 0.0)
+
+        stats = self.weapons.get(weapon)
+        if stats is None:
+            stats = self.weapons[weapon] = WeaponStats()
+
+        stats.matches += 1
+        stats.extracts += extracted
+        stats.cost += cost
+        stats.loot += loot_value
+
+    def profit_per_hour(self, now=None):
+        if self.started_at is None:
+            return 0.0
+
+        now = now or datetime.now()
+        # At least a minute, so the first raid does not read as millions/h
+        hours = max((now - self.started_at).total_seconds() / 3600, 1 / 60)
+        return self.profit / hours
+
+    def best_weapon(self):
+        ranked = [
+            (stats.extract_rate(), stats.roi(), name)
+            for name, stats in self.weapons.items()
+            if stats.matches >= self.MIN_WEAPON_MATCHES
+        ]
+        return max(ranked)[2] if ranked else None
+
+    def snapshot(self, now=None):
+        return {
+            "matches": self.matches,
+            "extracts": self.extracts,
+            "deaths": self.deaths,
+            "profit": self.profit,
+            "kills": self.kills,
+            "win_rate": self.extracts / self.matches if self.matches else 0.0,
+            "profit_per_hour": self.profit_per_hour(now),
+            "recent_count": self.recent_profit.count,
+            "recent_profit": self.recent_profit.mean(),
+            "recent_kills": self.recent_kills.mean(),
+            "recent_win_rate": self.recent_extracts.mean(),
+            "streak": self.streak,
+            "best_streak": self.best_streak,
+            "worst_streak": self.worst_streak,
+            "best_weapon": self.best_weapon(),
+            "weapons": {
+                name: {
+                    "matches": stats.matches,
+                    "extract_rate": stats.extract_rate(),
+                    "roi": stats.roi(),
+                }
+                for name, stats in self.weapons.items()
+            },
+        }
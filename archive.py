@@ -0,0 +1,317 @@
+# archive.py
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from outbox import DATA_DIR
+
+
+ARCHIVE_DIR = os.path.join(DATA_DIR, "archive")
+
+# Stored columns -> dtype. The weapon column holds indexes into the
+# weapon dictionary (meta.json); logged_at is epoch seconds.
+COLUMNS = {
+    "logged_at": np.int64,
+    "cost": np.float64,
+    "loot_value": np.float64,
+    "kills": np.int32,
+    "initiated_fight": np.bool_,
+    "weapon": np.uint16,
+}
+
+# Group-by keys with a fixed number of groups
+KEYS = ("weapon", "initiated_fight")
+
+
+class MatchArchive:
+
+    # Columnar, memory-mapped history of logged matches for vectorized
+    # queries. Every column is one .npy file opened with mmap, so opening
+    # the archive reads no data and a query only touches the columns it
+    # uses. Files are preallocated and doubled when full, so appends are
+    # amortized O(1); meta.json holds the row count, the weapon
+    # dictionary and the last store id archived (written after the
+    # columns, so a crash mid-append just re-appends those rows).
+    #
+    # Queries take a boolean mask from where(); "profit" and "extracted"
+    # are derived columns.
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self.count = 0
+        self.capacity = 0
+        self.last_id = 0
+        self.weapons = []
+        self.codes = {}
+        self.columns = {}
+
+        meta = os.path.join(directory, "meta.json")
+        if os.path.exists(meta):
+            with open(meta, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            self.count = data["count"]
+            self.capacity = data["capacity"]
+            self.last_id = data["last_id"]
+            self.weapons = data["weapons"]
+            self.codes = {name: i for i, name in enumerate(self.weapons)}
+
+            for name in COLUMNS:
+                self.columns[name] = np.load(self.path(name), mmap_mode="r+")
+        else:
+            self.allocate(self.INITIAL_CAPACITY)
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{name}.npy")
+
+    # -----------------------------
+    # WRITING
+    # -----------------------------
+
+    def allocate(self, capacity):
+        for name, dtype in COLUMNS.items():
+            tmp = self.path(name) + ".tmp"
+
+            column = open_memmap(tmp, mode="w+", dtype=dtype, shape=(capacity,))
+            old = self.columns.get(name)
+
+            if old is not None:
+                column[:self.count] = old[:self.count]
+                # Drop our mapping before the file is replaced (Windows)
+                del old
+                del self.columns[name]
+
+            column.flush()
+            del column
+
+            os.replace(tmp, self.path(name))
+            self.columns[name] = np.load(self.path(name), mmap_mode="r+")
+
+        self.capacity = capacity
+        self.save_meta()
+
+    def save_meta(self):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "count": self.count,
+                "capacity": self.capacity,
+                "last_id": self.last_id,
+                "weapons": self.weapons,
+            }, f)
+
+        os.replace(tmp, os.path.join(self.directory, "meta.json"))
+
+    def weapon_code(self, weapon):
+        code = self.codes.get(weapon)
+
+        if code is None:
+            code = self.codes[weapon] = len(self.weapons)
+            self.weapons.append(weapon)
+
+        return code
+
+    def append(self, matches, last_id=None):
+        # matches: dicts with the log_match fields (+ logged_at ISO string)
+        matches = list(matches)
+        if not matches:
+            return
+
+        needed = self.count + len(matches)
+        if needed > self.capacity:
+            capacity = self.capacity
+            while capacity < needed:
+                capacity *= 2
+            self.allocate(capacity)
+
+        rows = slice(self.count, needed)
+
+        self.columns["logged_at"][rows] = [
+            int(datetime.fromisoformat(match["logged_at"]).timestamp()) for match in matches
+        ]
+        self.columns["cost"][rows] = [match["cost"] for match in matches]
+        self.columns["loot_value"][rows] = [match["loot_value"] for match in matches]
+        self.columns["kills"][rows] = [match["kills"] for match in matches]
+        self.columns["initiated_fight"][rows] = [match["initiated_fight"] == "Y" for match in matches]
+        self.columns["weapon"][rows] = [self.weapon_code(match["weapon"]) for match in matches]
+
+        for column in self.columns.values():
+            column.flush()
+
+        self.count = needed
+        if last_id is not None:
+            self.last_id = last_id
+
+        self.save_meta()
+
+    def sync_from_store(self, store):
+        # Appends the store's matches this archive has not seen yet
+        matches = store.matches(after_id=self.last_id)
+
+        if matches:
+            self.append(matches, last_id=matches[-1]["id"])
+
+        return len(matches)
+
+    # -----------------------------
+    # QUERIES
+    # -----------------------------
+
+    def column(self, name):
+        if name == "profit":
+            return self.column("loot_value") - self.column("cost")
+        if name == "extracted":
+            return self.column("loot_value") != 0
+
+        return self.columns[name][:self.count]
+
+    def where(self, weapon=None, initiated_fight=None, since=None, until=None, **ranges):
+        # -> boolean mask. ranges: min_<column>=x / max_<column>=x
+        mask = np.ones(self.count, dtype=bool)
+
+        if weapon is not None:
+            code = self.codes.get(weapon)
+            if code is None:
+                return np.zeros(self.count, dtype=bool)
+            mask &= self.column("weapon") == code
+
+        if initiated_fight is not None:
+            mask &= self.column("initiated_fight") == bool(initiated_fight)
+
+        if since is not None:
+            mask &= self.column("logged_at") >= int(since.timestamp())
+
+        if until is not None:
+            mask &= self.column("logged_at") < int(until.timestamp())
+
+        for key, value in ranges.items():
+            bound, _, name = key.partition("_")
+
+            if bound == "min":
+                mask &= self.column(name) >= value
+            elif bound == "max":
+                mask &= self.column(name) <= value
+            else:
+                raise ValueError(f"Unknown filter: {key}")
+
+        return mask
+
+    def values(self, column, mask=None):
+        values = self.column(column)
+        return values if mask is None else values[mask]
+
+    def aggregate(self, column, how="mean", mask=None):
+        values = self.values(column, mask)
+
+        if how == "count":
+            return int(values.size)
+        if not values.size:
+            return 0.0
+
+        return float(getattr(np, how)(values))
+
+    def percentile(self, column, q, mask=None):
+        values = self.values(column, mask)
+
+        if not values.size:
+            return np.zeros(np.shape(q))
+
+        return np.percentile(values, q)
+
+    def group_by(self, key, column, how="mean", mask=None):
+        # -> {group: value}; vectorized with bincount over the key codes
+        if key not in KEYS:
+            raise ValueError(f"Cannot group by {key}")
+
+        codes = self.values(key, mask).astype(np.intp)
+        groups = len(self.weapons) if key == "weapon" else 2
+
+        counts = np.bincount(codes, minlength=groups)
+
+        if how == "count":
+            result = counts
+        else:
+            sums = np.bincount(codes, weights=self.values(column, mask), minlength=groups)
+
+            if how == "sum":
+                result = sums
+            elif how == "mean":
+                result = np.divide(sums, counts, out=np.zeros(groups), where=counts > 0)
+            else:
+                raise ValueError(f"Unsupported aggregation: {how}")
+
+        labels = self.weapons if key == "weapon" else [False, True]
+
+        return {
+            labels[i]: (int(result[i]) if how == "count" else float(result[i]))
+            for i in range(groups)
+            if counts[i]
+        }
+
+    def __len__(self):
+        return self.count
+
+
+# -----------------------------
+# BENCHMARK
+# -----------------------------
+
+def benchmark(count=100_000):
+    directory = tempfile.mkdtemp()
+    rng = np.random.default_rng(0)
+    weapons = ["rattler", "stitcher", "ferro", "kettle", "bobcat", "tempest",
+               "anvil", "venator", "renegade", "burletta", "toro"]
+
+    start = datetime(2025, 1, 1).timestamp()
+    matches = [
+        {
+            "logged_at": datetime.fromtimestamp(start + i * 600).isoformat(timespec="seconds"),
+            "cost": float(rng.integers(0, 200) * 1000),
+            "loot_value": float(rng.integers(0, 400) * 1000) if rng.random() > 0.35 else 0.0,
+            "kills": int(rng.integers(0, 6)),
+            "initiated_fight": "Y" if rng.random() > 0.5 else "N",
+            "weapon": weapons[int(rng.integers(0, len(weapons)))],
+        }
+        for i in range(count)
+    ]
+
+    MatchArchive(directory).append(matches, last_id=count)
+    size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+
+    def timed(label, fn):
+        began = time.perf_counter()
+        result = fn()
+        print(f"  {label:<44} {(time.perf_counter() - began) * 1000:7.2f} ms")
+        return result
+
+    print(f"{count} matches, {size / 1e6:.1f} MB on disk")
+
+    archive = timed("open (memory-mapped)", lambda: MatchArchive(directory))
+    fights = timed("where(initiated_fight=Y)", lambda: archive.where(initiated_fight=True))
+    by_weapon = timed("avg profit by weapon | initiated_fight=Y", lambda: archive.group_by("weapon", "profit", mask=fights))
+    timed("extract rate by weapon", lambda: archive.group_by("weapon", "extracted"))
+    timed("p50/p90/p99 loot_value | ferro", lambda: archive.percentile("loot_value", [50, 90, 99], archive.where(weapon="ferro")))
+    timed("mean kills | cost >= 100k", lambda: archive.aggregate("kills", mask=archive.where(min_cost=100_000)))
+
+    print("avg profit by weapon when initiated_fight=Y:")
+    for weapon, profit in sorted(by_weapon.items(), key=lambda item: -item[1]):
+        print(f"  {weapon:<10} {profit:>12,.0f}")
+
+    del archive
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,519 @@
+# capture.py
+
+import json
+import struct
+import threading
+import time
+import zlib
+
+import cv2
+import mss
+import numpy as np
+
+from metrics import metrics
+
+
+def primary_screen():
+    # -> (left, top, width, height) of the primary monitor, or None when
+    # there is no display to ask (e.g. headless replay)
+    try:
+        with mss.mss() as sct:
+            monitor = sct.monitors[1]
+            return monitor["left"], monitor["top"], monitor["width"], monitor["height"]
+    except Exception as e:
+        print("[WARN] Could not detect screen geometry:", e)
+        return None
+
+
+def union_bounds(regions):
+    regions = list(regions)
+
+    left = min(x for x, _, _, _ in regions)
+    top = min(y for _, y, _, _ in regions)
+    right = max(x + w for x, _, w, _ in regions)
+    bottom = max(y + h for _, y, _, h in regions)
+
+    return left, top, right - left, bottom - top
+
+
+class Frame:
+
+    # One screen capture per detector tick. The union of every region the
+    # detector needs is grabbed and converted to grayscale once; region()
+    # then hands out NumPy views into that single buffer (no copies).
+
+    def __init__(self, gray, origin, regions, timestamp=None):
+        self.gray = gray
+        self.origin = origin
+        self.regions = regions
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+        # Filled in as the frame moves through the detector stages
+        self.seq = None
+        self.changed = {name: True for name in regions}
+        self.matches = {}
+        self.reads = {}
+        # seq of the frame each read was made on (absorbed reads keep
+        # the seq of the dropped frame they came from)
+        self.read_seqs = {}
+        self.marks = {}
+
+        # What the match lifecycle asked to evaluate (None = everything)
+        self.templates = None
+        self.wanted_reads = None
+        self.sweep = False
+        # What the poll scheduler picked for this tick (None = everything)
+        self.due = None
+
+    @classmethod
+    def grab(cls, sct, regions):
+        left, top, width, height = union_bounds(regions.values())
+        monitor = {"left": left, "top": top, "width": width, "height": height}
+
+        screenshot = np.asarray(sct.grab(monitor))
+        gray = cv2.cvtColor(screenshot, cv2.COLOR_BGRA2GRAY)
+
+        return cls(gray, (left, top), regions)
+
+    def region(self, name):
+        x, y, w, h = self.regions[name]
+        ox, oy = self.origin
+        return self.gray[y - oy:y - oy + h, x - ox:x - ox + w]
+
+    def wants(self, read):
+        return self.wanted_reads is None or read in self.wanted_reads
+
+    def is_due(self, key):
+        return self.due is None or key in self.due
+
+    def set_read(self, name, value):
+        self.reads[name] = value
+        self.read_seqs[name] = self.seq
+
+    def own_reads(self):
+        # Reads made on this frame's pixels, not taken over from a
+        # dropped one
+        return {name: value for name, value in self.reads.items() if self.read_seqs.get(name) == self.seq}
+
+    def mark(self, stage):
+        self.marks[stage] = time.perf_counter()
+
+    def absorb(self, older):
+        # Take over the work of an older frame that was dropped before it
+        # was applied: its changed regions must still be re-evaluated, and
+        # any results it already has stand in until this frame's own.
+        for name, changed in older.changed.items():
+            if changed:
+                self.changed[name] = True
+
+        self.matches = {**older.matches, **self.matches}
+        self.reads = {**older.reads, **self.reads}
+        self.read_seqs = {**older.read_seqs, **self.read_seqs}
+
+        if self.templates is None or older.templates is None:
+            self.templates = None
+        else:
+            self.templates = self.templates | older.templates
+
+        if self.wanted_reads is None or older.wanted_reads is None:
+            self.wanted_reads = None
+        else:
+            self.wanted_reads = self.wanted_reads | older.wanted_reads
+
+        self.sweep = self.sweep or older.sweep
+
+        if self.due is None or older.due is None:
+            self.due = None
+        else:
+            self.due = self.due | older.due
+
+
+class FrameHistory:
+
+    # The last `capacity` frames of one region, in arrays allocated once:
+    # push() copies into the oldest slot, nothing is allocated per tick.
+    # Every entry keeps the frame's timestamp and sequence number plus the
+    # reads made on it, so an event can be resolved against the exact
+    # frame that triggered it or the frames just before.
+
+    CAPACITY = 16
+
+    def __init__(self, region, capacity=CAPACITY):
+        self.region = region
+        self.capacity = capacity
+
+        # Sized on the first push, once the region's shape is known
+        self.images = None
+        self.timestamps = np.zeros(capacity)
+        self.seqs = np.full(capacity, -1, dtype=np.int64)
+        self.reads = [None] * capacity
+
+        self.next = 0
+        self.count = 0
+
+    def push(self, frame, reads=None):
+        img = frame.region(self.region)
+
+        if self.images is None or self.images.shape[1:] != img.shape:
+            self.images = np.empty((self.capacity,) + img.shape, dtype=np.uint8)
+            self.count = 0
+
+        slot = self.next
+        np.copyto(self.images[slot], img)
+        self.timestamps[slot] = frame.timestamp
+        self.seqs[slot] = frame.seq
+        self.reads[slot] = dict(reads or {})
+
+        self.next = (slot + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        return slot
+
+    def recent(self, seq, timestamp, window, include=True):
+        # -> slots of the frames up to seq (or before it), newest first,
+        # at most `window` seconds older than timestamp
+        for i in range(self.count):
+            slot = (self.next - 1 - i) % self.capacity
+
+            if self.seqs[slot] > seq or (not include and self.seqs[slot] == seq):
+                continue
+
+            if timestamp - self.timestamps[slot] > window:
+                break
+
+            yield slot
+
+
+class RegionChangeGate:
+
+    # Cheap per-region change detector. Each region is reduced to a grid
+    # of BLOCK x BLOCK pixel means; the region counts as unchanged while
+    # no block mean has moved more than THRESHOLD gray levels since the
+    # last time the region was actually evaluated. Comparing against the
+    # last evaluated signature (not the previous tick) keeps slow drift
+    # from slipping through.
+
+    BLOCK = 16
+    THRESHOLD = 6.0
+
+    def __init__(self, threshold=THRESHOLD, block=BLOCK, enabled=True):
+        self.threshold = threshold
+        self.block = block
+        self.enabled = enabled
+
+        self.reference = {}
+        self.checks = {}
+        self.unchanged = {}
+        # Written from the match and OCR threads
+        self.skipped = {}
+        self.skip_lock = threading.Lock()
+
+    def reset(self):
+        self.reference.clear()
+
+    def signature(self, img):
+        h, w = img.shape[:2]
+        size = (max(1, w // self.block), max(1, h // self.block))
+        return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+    def region_changed(self, name, img):
+        self.checks[name] = self.checks.get(name, 0) + 1
+
+        if not self.enabled:
+            return True
+
+        sig = self.signature(img)
+        ref = self.reference.get(name)
+
+        if ref is not None and ref.shape == sig.shape:
+            if cv2.absdiff(sig, ref).max() <= self.threshold:
+                self.unchanged[name] = self.unchanged.get(name, 0) + 1
+                return False
+
+        self.reference[name] = sig
+        return True
+
+    def check(self, frame):
+        return {name: self.region_changed(name, frame.region(name)) for name in frame.regions}
+
+    def note_skip(self, kind, count=1):
+        with self.skip_lock:
+            self.skipped[kind] = self.skipped.get(kind, 0) + count
+        metrics.count(f"skip.{kind}", count)
+
+    def stats(self):
+        with self.skip_lock:
+            skipped = dict(self.skipped)
+
+        return {
+            "enabled": self.enabled,
+            "regions": {
+                name: {
+                    "checks": self.checks[name],
+                    "unchanged": self.unchanged.get(name, 0),
+                }
+                for name in self.checks
+            },
+            "skipped": skipped,
+        }
+
+
+# -----------------------------
+# FRAME SOURCES
+# -----------------------------
+#
+# A frame source hands the detector one Frame per tick and owns the
+# detector's notion of time: clock() drives the poll scheduler and
+# wait() paces the loop. Live capture uses the real clock; replay can
+# run on the recorded timestamps so a session plays back with the same
+# decisions at any speed.
+
+class LiveFrameSource:
+
+    def __init__(self, regions, screen=None):
+        self.regions = regions
+        self.screen = screen
+        self.sct = None
+
+    def __enter__(self):
+        self.sct = mss.mss()
+        return self
+
+    def __exit__(self, *exc):
+        self.sct.close()
+        self.sct = None
+
+    def grab(self):
+        return Frame.grab(self.sct, self.regions)
+
+    def clock(self):
+        return time.monotonic()
+
+    def wait(self, seconds, stop_event):
+        stop_event.wait(seconds)
+
+
+class FrameRecorder:
+
+    # Compact session recording: only the captured (union of configured)
+    # regions in grayscale. Every KEYFRAME_EVERY frames a full frame is
+    # stored; in between only the wrapping uint8 difference to the
+    # previous frame, so static screens compress to almost nothing.
+    #
+    # File: MAGIC, uint32 header length, JSON header, then records of
+    # (float64 timestamp, uint8 kind, uint32 length) + zlib payload.
+
+    MAGIC = b"ARCREC1\n"
+    RECORD = struct.Struct("<dBI")
+    KEYFRAME = 0
+    DELTA = 1
+    KEYFRAME_EVERY = 120
+    LEVEL = 1
+
+    def __init__(self, path, regions, screen=None, keyframe_every=KEYFRAME_EVERY, level=LEVEL):
+        self.path = path
+        self.regions = regions
+        self.screen = screen
+        self.keyframe_every = keyframe_every
+        self.level = level
+
+        self.file = None
+        self.previous = None
+        self.count = 0
+        self.bytes_written = 0
+        self.lock = threading.Lock()
+
+    def open(self, frame):
+        header = json.dumps({
+            "regions": {name: list(region) for name, region in self.regions.items()},
+            "origin": list(frame.origin),
+            "shape": list(frame.gray.shape),
+            "screen": list(self.screen) if self.screen else None,
+        }).encode()
+
+        self.file = open(self.path, "wb")
+        self.file.write(self.MAGIC)
+        self.file.write(struct.pack("<I", len(header)))
+        self.file.write(header)
+
+    def write(self, frame):
+        with self.lock:
+            if self.file is None:
+                self.open(frame)
+
+            gray = np.ascontiguousarray(frame.gray)
+
+            if (
+                self.previous is None
+                or self.previous.shape != gray.shape
+                or self.count % self.keyframe_every == 0
+            ):
+                kind, payload = self.KEYFRAME, gray
+            else:
+                kind, payload = self.DELTA, np.subtract(gray, self.previous, dtype=np.uint8)
+
+            data = zlib.compress(payload.tobytes(), self.level)
+            self.file.write(self.RECORD.pack(frame.timestamp, kind, len(data)))
+            self.file.write(data)
+
+            self.previous = gray.copy()
+            self.count += 1
+            self.bytes_written += self.RECORD.size + len(data)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+                print(f"[RECORD] {self.count} frames, {self.bytes_written / 1e6:.1f} MB -> {self.path}")
+
+
+class RecordingFrameSource:
+
+    # Wraps another source and records every frame it hands out
+
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.recorder = FrameRecorder(path, inner.regions, screen=inner.screen)
+        self.regions = inner.regions
+        self.screen = inner.screen
+
+    def __enter__(self):
+        self.inner.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.inner.__exit__(*exc)
+        finally:
+            self.recorder.close()
+
+    def grab(self):
+        frame = self.inner.grab()
+        if frame is not None:
+            self.recorder.write(frame)
+        return frame
+
+    def clock(self):
+        return self.inner.clock()
+
+    def wait(self, seconds, stop_event):
+        self.inner.wait(seconds, stop_event)
+
+
+class ReplayFrameSource:
+
+    # Plays back a FrameRecorder file.
+    #
+    # realtime=False: every grab() returns the next recorded frame and the
+    # clock follows the recorded timestamps. The recording holds one frame
+    # per live detector tick, so the detector sees exactly the frames it
+    # saw live, as fast as it can process them. The pipeline runs lossless
+    # for it (stages wait instead of dropping frames).
+    #
+    # realtime=True: grab() returns the newest frame at or before the
+    # wall-clock position in the recording (frames are skipped if the
+    # detector falls behind).
+    #
+    # grab() returns None once the recording is exhausted.
+
+    def __init__(self, path, realtime=False):
+        self.path = path
+        self.realtime = realtime
+        self.lossless = not realtime
+
+        self.file = None
+        self.regions = None
+        self.origin = None
+        self.shape = None
+        self.screen = None
+
+        self.current = None
+        self.current_ts = None
+        self.pending = None
+
+        self.started_real = None
+        self.first_ts = None
+
+        # Read the header up front so the detector can size its regions
+        # and templates for the recorded screen
+        with open(path, "rb") as f:
+            self.read_header(f)
+
+    def read_header(self, f):
+        if f.read(len(FrameRecorder.MAGIC)) != FrameRecorder.MAGIC:
+            raise ValueError(f"Not a frame recording: {self.path}")
+
+        (length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(length))
+
+        self.regions = {name: tuple(region) for name, region in header["regions"].items()}
+        self.origin = tuple(header["origin"])
+        self.shape = tuple(header["shape"])
+
+        if header.get("screen"):
+            self.screen = tuple(header["screen"])
+        else:
+            self.screen = union_bounds(self.regions.values())
+
+    def __enter__(self):
+        self.file = open(self.path, "rb")
+        self.read_header(self.file)
+
+        self.pending = self.read_record()
+        if self.pending is not None:
+            self.first_ts = self.pending[0]
+            self.current_ts = self.first_ts
+            self.started_real = time.monotonic()
+
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+    def read_record(self):
+        head = self.file.read(FrameRecorder.RECORD.size)
+        if len(head) < FrameRecorder.RECORD.size:
+            return None
+
+        ts, kind, length = FrameRecorder.RECORD.unpack(head)
+        data = self.file.read(length)
+        if len(data) < length:
+            # Truncated tail (recorder did not shut down cleanly)
+            return None
+
+        return ts, kind, data
+
+    def advance(self):
+        ts, kind, data = self.pending
+        payload = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(self.shape)
+
+        if kind == FrameRecorder.KEYFRAME:
+            self.current = payload.copy()
+        else:
+            self.current = np.add(self.current, payload, dtype=np.uint8)
+
+        self.current_ts = ts
+        self.pending = self.read_record()
+
+    def clock(self):
+        if self.realtime and self.started_real is not None:
+            return self.first_ts + (time.monotonic() - self.started_real)
+        return self.current_ts or 0.0
+
+    def grab(self):
+        if self.pending is None:
+            return None
+
+        if not self.realtime or self.current is None:
+            self.advance()
+        else:
+            # Deltas still have to be applied in order when catching up
+            now = self.clock()
+            while self.pending is not None and self.pending[0] <= now:
+                self.advance()
+
+        return Frame(self.current, self.origin, self.regions, timestamp=self.current_ts)
+
+    def wait(self, seconds, stop_event):
+        if self.realtime:
+            stop_event.wait(seconds)
@@ -1,36 +1,122 @@
 import cv2
 import numpy as np
-import mss
 import time
 import os
-import pytesseract
 import re
+from concurrent.futures import wait
 from datetime import datetime
 import threading
 
+from capture import (
+    LiveFrameSource,
+    primary_screen,
+    FrameHistory,
+    RecordingFrameSource,
+    RegionChangeGate,
+    ReplayFrameSource,
+    union_bounds,
+)
+from glyphs import GlyphBank
+from match_pool import MatchPool, view_rect
+from metrics import metrics
+from matching import LocationTracker
+from ocr import KeywordVerifier, OcrCache, create_ocr_engine
+from phases import END_ROUND, LOADOUT_LOCKED, PHASES, MatchLifecycle
+from pipeline import DetectorPipeline, LatencyStats
+from scheduler import PollScheduler
+from template_cache import BASE_HEIGHT, TemplateCache
+
 
 class MatchDetector:
 
-    def __init__(self, callback, is_app_visible_callback):
+    def __init__(self, callback, is_app_visible_callback, frame_source=None):
         self.callback = callback
         self.is_app_visible = is_app_visible_callback
+        self.frame_source = frame_source
         self.running = False
         self.cooldown_until = 0
+        self.stop_event = threading.Event()
 
         BASE_DIR = os.path.dirname(os.path.abspath(__file__))
         ASSETS_DIR = os.path.join(BASE_DIR, "assets")
 
         self.THRESHOLD = 0.78
+        self.READY_THRESHOLD = 0.75
         self.CHECK_INTERVAL = 0.5
 
-        SCREEN_WIDTH = 1920
-        SCREEN_HEIGHT = 1080
+        # Record every captured frame to this file (replay with
+        # `python detector.py <file>`)
+        self.RECORD_PATH = os.environ.get("ARC_RECORD")
+
+        # Skip matching / OCR for regions whose pixels have not changed
+        self.CHANGE_GATE_ENABLED = True
+        self.CHANGE_THRESHOLD = RegionChangeGate.THRESHOLD
+
+        # Currency OCR results cached by binarized crop
+        self.OCR_CACHE_SIZE = OcrCache.MAX_SIZE
+        self.OCR_CACHE_TOLERANCE = 0.0
+
+        # Read currency digits with the glyph bank, Tesseract only when it
+        # is not confident. The bank is built from a labeled crop set
+        # (`python glyphs.py build <dir>`), never from OCR reads.
+        self.GLYPHS_ENABLED = True
+
+        # Save every Tesseract-read currency crop here as <value>_<time>.png,
+        # a labeled set for `python glyphs.py build|eval <dir>`
+        self.CURRENCY_SAMPLES_DIR = os.environ.get("ARC_CURRENCY_SAMPLES")
+
+        # Run capture, matching and OCR as separate pipelined stages
+        self.PIPELINE_ENABLED = True
+        self.MATCH_WORKERS = 2
+        self.OCR_WORKERS = 1
+
+        # Template matching in this many worker processes, frames shared
+        # through shared memory (0 = on the match threads). Benchmark with
+        # `python match_pool.py <recording>`.
+        self.PROCESS_WORKERS = int(os.environ.get("ARC_MATCH_PROCESSES", "0"))
+        self.pool = None
+
+        # Snapshots (loadout cost, findings value) read the currency from
+        # the frame that triggered them, or the newest of the frames kept
+        # in the history up to SNAPSHOT_WINDOW seconds before it
+        self.HISTORY_SIZE = FrameHistory.CAPACITY
+        self.SNAPSHOT_WINDOW = 2.0
+
+        # Only evaluate the templates / OCR reads the current match phase
+        # needs (a periodic full sweep keeps the phase in sync)
+        self.LIFECYCLE_ENABLED = True
+
+        # Adaptive per-template / per-read polling instead of evaluating
+        # everything every CHECK_INTERVAL
+        self.SCHEDULER_ENABLED = True
+        self.WORK_BUDGET = PollScheduler.WORK_BUDGET
+
+        # Screen geometry: a replay brings the recorded screen, otherwise
+        # ask the primary monitor (1920x1080 if there is none)
+        screen = getattr(frame_source, "screen", None) or primary_screen()
+        self.SCREEN = screen or (0, 0, 1920, 1080)
+
+        SCREEN_LEFT, SCREEN_TOP, SCREEN_WIDTH, SCREEN_HEIGHT = self.SCREEN
+
+        # Templates were cut at 1080p; everything pixel-sized scales with height
+        self.SCALE = SCREEN_HEIGHT / BASE_HEIGHT
+
+        # (x, y, w, h) as fractions of the screen
+        self.REGION_FRACTIONS = {
+            "top_left": (0, 0, 0.75, 0.5),
+            "top_right": (0.5, 0, 0.5, 0.5),
+            "top_middle": (0, 0, 1, 1),
+            "bottom_right": (0.5, 0.5, 0.5, 0.5),
+        }
 
         self.REGIONS = {
-            "top_left": (0, 0, int(SCREEN_WIDTH * 0.75), SCREEN_HEIGHT // 2),
-            "top_right": (SCREEN_WIDTH // 2, 0, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2),
-            "top_middle": (0, 0, SCREEN_WIDTH, SCREEN_HEIGHT),
-            "bottom_right": (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2),
+            name: (
+                SCREEN_LEFT + int(SCREEN_WIDTH * fx),
+                SCREEN_TOP + int(SCREEN_HEIGHT * fy),
+                int(SCREEN_WIDTH * fw),
+                int(SCREEN_HEIGHT * fh),
+            )
+            for name, (fx, fy, fw, fh) in self.REGION_FRACTIONS.items()
         }
 
         self.TEMPLATES = {
@@ -43,26 +129,71 @@ class MatchDetector:
             "show_app": ("show_app_raider.png", "top_right"),
         }
 
-        self.loaded_templates = {}
-
-        for name, (filename, region_name) in self.TEMPLATES.items():
-            path = os.path.join(ASSETS_DIR, filename)
-
-            if not os.path.exists(path):
-                print(f"[ERROR] Missing asset: {path}")
-                continue
+        # Multi-scale templates: the scaled copies are prepared once (and
+        # cached on disk) instead of being resized on every tick.
+        self.MULTI_SCALE = {
+            "ready": np.linspace(0.8, 1.2, 9),
+        }
 
-            img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
-            if img is None:
-                print(f"[ERROR] Failed to load: {filename}")
-                continue
+        images, self.pyramids = TemplateCache(ASSETS_DIR).load(
+            self.TEMPLATES,
+            (SCREEN_WIDTH, SCREEN_HEIGHT),
+            self.MULTI_SCALE
+        )
 
-            self.loaded_templates[name] = {
-                "image": img,
+        self.loaded_templates = {
+            name: {
+                "image": images[name],
                 "region": region_name
             }
+            for name, (_, region_name) in self.TEMPLATES.items()
+            if name in images
+        }
 
-        print(f"[INIT] Loaded {len(self.loaded_templates)} templates")
+        print(f"[INIT] Loaded {len(self.loaded_templates)} templates for {SCREEN_WIDTH}x{SCREEN_HEIGHT}")
+
+        # Search near each template's last hit before scanning its region
+        self.tracker = LocationTracker(scale=self.SCALE)
+        self.footprints = {
+            name: data["image"].shape for name, data in self.loaded_templates.items()
+        }
+        for name, pyramid in self.pyramids.items():
+            self.footprints[name] = (
+                max(full.shape[0] for _, full, _ in pyramid.levels),
+                max(full.shape[1] for _, full, _ in pyramid.levels),
+            )
+
+        # Regions captured every tick: every template region plus the
+        # currency (top_left) and findings text (top_right) reads.
+        needed = {data["region"] for data in self.loaded_templates.values()}
+        needed.update(("top_left", "top_right"))
+        self.capture_regions = {name: self.REGIONS[name] for name in needed}
+
+        self.gate = RegionChangeGate(
+            threshold=self.CHANGE_THRESHOLD,
+            enabled=self.CHANGE_GATE_ENABLED
+        )
+        self.history = FrameHistory("top_left", self.HISTORY_SIZE)
+        self.last_matches = {}
+        self.last_currency_read = None
+        self.last_findings_text = None
+        self.currency_fresh = False
+        self.dirty = set()
+
+        self.ocr = create_ocr_engine()
+
+        # Keyword checks anchored on the template that sits next to the word
+        self.keywords = {
+            "FINDINGS": (KeywordVerifier(self.ocr, "FINDINGS", scale=self.SCALE), "end_round_findings"),
+            "RAIDER": (KeywordVerifier(self.ocr, "RAIDER", scale=self.SCALE), "show_app"),
+        }
+
+        self.currency_cache = OcrCache(
+            max_size=self.OCR_CACHE_SIZE,
+            tolerance=self.OCR_CACHE_TOLERANCE
+        )
+
+        self.glyphs = GlyphBank() if self.GLYPHS_ENABLED else None
 
         self.previous_state = {}
         self.previous_currency = None
@@ -72,57 +203,175 @@ class MatchDetector:
 
         self.findings_snapshot_taken = False
 
+        self.lifecycle = MatchLifecycle(enabled=self.LIFECYCLE_ENABLED)
+        self.scheduler = PollScheduler(
+            enabled=self.SCHEDULER_ENABLED,
+            work_budget=self.WORK_BUDGET
+        )
+        self.scheduler.pin(PHASES[self.lifecycle.phase].watched)
+
+        self.next_seq = 0
+        self.latency = LatencyStats()
+        self.pipeline = None
+
+        # Called once, after the first frame has been fully processed
+        # (startup time-to-first-detection)
+        self.on_first_frame = None
+
+        # Component stats, read with every metrics snapshot
+        metrics.add_source("lifecycle", self.get_lifecycle_stats)
+        metrics.add_source("gate", self.get_gate_stats)
+        metrics.add_source("ocr_cache", self.get_ocr_cache_stats)
+        metrics.add_source("glyphs", self.get_glyph_stats)
+        metrics.add_source("keywords", self.get_keyword_stats)
+        metrics.add_source("tracking", self.get_tracking_stats)
+        metrics.add_source("scheduler", self.get_scheduler_stats)
+        metrics.add_source("latency", self.get_latency_stats)
+        metrics.add_source("pool", self.get_pool_stats)
+
     def start(self):
         self.running = True
-        threading.Thread(target=self._run, daemon=True).start()
+        self.stop_event.clear()
+
+        if self.PIPELINE_ENABLED:
+            self.pipeline = DetectorPipeline(
+                self,
+                match_workers=self.MATCH_WORKERS,
+                ocr_workers=self.OCR_WORKERS,
+                lossless=self.frame_source is not None and self.frame_source.lossless
+            )
+            self.pipeline.start()
+        else:
+            threading.Thread(target=self._run, daemon=True).start()
 
     def stop(self):
         self.running = False
+        self.stop_event.set()
+
+    def close(self):
+        # Called by the detector thread once it has stopped
+        self.ocr.close()
+        self.close_match_pool()
+
+    def open_match_pool(self):
+        # Blocks until the workers are up; called from the detector thread
+        if self.PROCESS_WORKERS <= 0 or self.pool is not None:
+            return
+
+        _, _, width, height = union_bounds(self.capture_regions.values())
+
+        pyramids = {}
+        if "ready" in self.pyramids:
+            pyramids["ready"] = (self.pyramids["ready"], self.READY_THRESHOLD)
+
+        self.pool = MatchPool(
+            self.PROCESS_WORKERS,
+            (height, width),
+            max(1, self.MATCH_WORKERS),
+            {name: data["image"] for name, data in self.loaded_templates.items() if name not in pyramids},
+            pyramids,
+            self.THRESHOLD
+        )
+        self.pool.start()
+
+    def close_match_pool(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
 
     def trigger_cooldown(self, seconds):
         self.cooldown_until = time.time() + seconds
 
+    def wait_for_cooldown(self):
+        remaining = self.cooldown_until - time.time()
+
+        if remaining <= 0:
+            return False
+
+        self.stop_event.wait(remaining)
+        return True
+
+    def wait_for_next_tick(self, source):
+        source.wait(self.scheduler.sleep_time(self.CHECK_INTERVAL), self.stop_event)
+
+    def open_frame_source(self):
+        source = self.frame_source or LiveFrameSource(self.capture_regions, screen=self.SCREEN)
+
+        if self.RECORD_PATH:
+            print(f"[RECORD] Recording frames to {self.RECORD_PATH}")
+            source = RecordingFrameSource(source, self.RECORD_PATH)
+
+        return source
+
     def get_snapshots(self):
         return self.loadout_cost_snapshot, self.loadout_value_snapshot
 
-    def grab_region(self, sct, region_tuple):
-        x, y, w, h = region_tuple
-        monitor = {"left": x, "top": y, "width": w, "height": h}
-        screenshot = np.array(sct.grab(monitor))
-        gray = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY)
-        return gray
+    def get_tracking_stats(self):
+        return self.tracker.stats()
 
-    def match_template(self, screen_img, template_img, template_name=None):
+    def get_gate_stats(self):
+        return self.gate.stats()
 
-        READY_THRESHOLD = 0.75
+    def get_ocr_cache_stats(self):
+        return self.currency_cache.stats()
 
-        if template_name == "ready":
+    def get_glyph_stats(self):
+        return self.glyphs.stats() if self.glyphs is not None else {"enabled": False}
 
-            best_conf = 0
-            best_loc = (0, 0)
+    def get_scheduler_stats(self):
+        return self.scheduler.stats()
 
-            for scale in np.linspace(0.8, 1.2, 9):
-                resized = cv2.resize(template_img, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+    def get_keyword_stats(self):
+        return {keyword: verifier.stats() for keyword, (verifier, _) in self.keywords.items()}
 
-                if resized.shape[0] > screen_img.shape[0] or resized.shape[1] > screen_img.shape[1]:
-                    continue
+    def get_phase(self):
+        return self.lifecycle.phase
+
+    def get_lifecycle_stats(self):
+        return self.lifecycle.stats()
+
+    def snapshot_source(self, frame, seq):
+        if seq is None:
+            return "(last read)"
+        if seq == frame.seq:
+            return f"(frame {seq})"
+        return f"(frame {seq}, {frame.seq - seq} before trigger)"
 
-                result = cv2.matchTemplate(screen_img, resized, cv2.TM_CCOEFF_NORMED)
-                _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    def get_pool_stats(self):
+        return self.pool.stats() if self.pool is not None else {"workers": 0}
 
-                if max_val > best_conf:
-                    best_conf = max_val
-                    best_loc = max_loc
+    def get_latency_stats(self):
+        stats = self.latency.stats()
+        if self.pipeline is not None:
+            stats["pipeline"] = self.pipeline.stats()
+        return stats
 
-            detected = best_conf >= READY_THRESHOLD
-            return detected, best_conf, best_loc
+    def match_template(self, screen_img, template_img, template_name=None):
+        if template_name is None or template_name not in self.footprints:
+            return self.match_region(screen_img, template_img, template_name)
+
+        return self.tracker.search(
+            template_name,
+            screen_img,
+            self.footprints[template_name],
+            lambda img: self.match_region(img, template_img, template_name)
+        )
+
+    def match_region(self, screen_img, template_img, template_name=None):
+
+        if template_name == "ready" and template_name in self.pyramids:
+            return self.pyramids[template_name].match(screen_img, self.READY_THRESHOLD)
 
         result = cv2.matchTemplate(screen_img, template_img, cv2.TM_CCOEFF_NORMED)
         _, max_val, _, max_loc = cv2.minMaxLoc(result)
         return max_val >= self.THRESHOLD, max_val, max_loc
 
-    def extract_currency_from_icon(self, screen_img, icon_template):
-        detected, _, icon_loc = self.match_template(screen_img, icon_template)
+    def currency_crop(self, screen_img, icon_template, icon_match=None):
+        # -> binarized crop of the digits next to the icon, or None
+        if icon_match is None:
+            icon_match = self.match_template(screen_img, icon_template, template_name="currency_icon")
+
+        detected, _, icon_loc = icon_match
 
         if not detected:
             return None
@@ -131,10 +380,10 @@ class MatchDetector:
         x, y = icon_loc
 
         crop_x1 = x + icon_w
-        crop_x2 = min(screen_img.shape[1], crop_x1 + 450)
+        crop_x2 = min(screen_img.shape[1], crop_x1 + int(450 * self.SCALE))
 
-        crop_y1 = max(0, y - 15)
-        crop_y2 = min(screen_img.shape[0], y + icon_h + 25)
+        crop_y1 = max(0, y - int(15 * self.SCALE))
+        crop_y2 = min(screen_img.shape[0], y + icon_h + int(25 * self.SCALE))
 
         crop = screen_img[crop_y1:crop_y2, crop_x1:crop_x2]
 
@@ -154,114 +403,570 @@ class MatchDetector:
             2
         )
 
-        text = pytesseract.image_to_string(
-            crop,
-            config="--psm 7 -c tessedit_char_whitelist=0123456789,"
-        )
+        return crop
+
+    def extract_currency_from_icon(self, screen_img, icon_template, icon_match=None):
+        crop = self.currency_crop(screen_img, icon_template, icon_match)
+
+        if crop is None:
+            return None
+
+        return self.currency_cache.get_or_compute(crop, self.read_currency_digits)
+
+    def read_currency_batch(self, crops, extra=()):
+        # -> (values, texts of extra). Crops the cache and the glyph bank
+        # cannot answer go to Tesseract in one batch, together with the
+        # extra (img, profile) reads.
+        values = [None] * len(crops)
+        pending = []
+
+        for i, crop in enumerate(crops):
+            if crop is None:
+                continue
+
+            found, value, key = self.currency_cache.get(crop)
+
+            if not found:
+                value = self.glyph_currency(crop)
+
+                if value is None:
+                    pending.append((i, key, crop))
+                    continue
+
+                self.currency_cache.put(key, crop, value)
+
+            values[i] = value
+
+        texts = self.ocr.read_batch([(crop, "currency") for _, _, crop in pending] + list(extra))
+
+        for (i, key, crop), text in zip(pending, texts):
+            values[i] = self.parse_currency(crop, text)
+            self.currency_cache.put(key, crop, values[i])
+
+        return values, texts[len(pending):]
+
+    def glyph_currency(self, crop):
+        if self.glyphs is None:
+            return None
 
+        with metrics.time("ocr.glyphs"):
+            value, _ = self.glyphs.read(crop)
+
+        return value
+
+    def read_currency_digits(self, crop):
+        value = self.glyph_currency(crop)
+        if value is not None:
+            return value
+
+        return self.parse_currency(crop, self.ocr.read(crop, "currency"))
+
+    def parse_currency(self, crop, text):
         cleaned = re.sub(r"[^\d]", "", text)
 
-        if cleaned:
-            return int(cleaned)
+        if not cleaned:
+            return None
+
+        value = int(cleaned)
+
+        if self.CURRENCY_SAMPLES_DIR:
+            self.save_currency_sample(crop, value)
+
+        return value
+
+    def history_currency(self, slot):
+        # Currency on a frame in the history: the read made on it, else
+        # read now from its stored pixels (once, the result is kept)
+        reads = self.history.reads[slot]
+
+        if "currency" not in reads:
+            metrics.count("history.currency_reads")
+
+            img = self.history.images[slot]
+            icon = self.loaded_templates["currency_icon"]["image"]
+
+            reads["currency"] = self.extract_currency_from_icon(
+                img,
+                icon,
+                icon_match=self.match_region(img, icon, "currency_icon")
+            )
+
+        return reads["currency"]
+
+    def prefetch_history_currency(self, slots):
+        # The slots snapshot_currency() may have to read from pixels (the
+        # unread ones newer than the first known value) are read in one
+        # OCR batch instead of one round trip each
+        missing = []
+
+        for slot in slots:
+            reads = self.history.reads[slot]
+
+            if "currency" not in reads:
+                missing.append(slot)
+            elif reads["currency"] is not None:
+                break
+
+        if len(missing) < 2:
+            return
+
+        icon = self.loaded_templates["currency_icon"]["image"]
+        crops = []
 
-        return None
+        for slot in missing:
+            img = self.history.images[slot]
+            crops.append(self.currency_crop(img, icon, icon_match=self.match_region(img, icon, "currency_icon")))
 
-    def detect_findings_text(self, sct):
-        region = self.REGIONS["top_right"]
-        img = self.grab_region(sct, region)
-        text = pytesseract.image_to_string(img)
-        return "FINDINGS" in text.upper()
+        values, _ = self.read_currency_batch(crops)
 
-    def detect_raider_text(self, sct):
-        region = self.REGIONS["top_right"]
-        img = self.grab_region(sct, region)
-        text = pytesseract.image_to_string(img)
-        return "RAIDER" in text.upper()
+        for slot, value in zip(missing, values):
+            metrics.count("history.currency_reads")
+            self.history.reads[slot]["currency"] = value
+
+    def snapshot_currency(self, frame, include_frame=True):
+        # -> (value, seq of the frame it was read on), or (None, None)
+        if "currency_icon" not in self.loaded_templates:
+            return None, None
+
+        slots = list(self.history.recent(frame.seq, frame.timestamp, self.SNAPSHOT_WINDOW, include=include_frame))
+        self.prefetch_history_currency(slots)
+
+        for slot in slots:
+            value = self.history_currency(slot)
+
+            if value is not None:
+                return value, int(self.history.seqs[slot])
+
+        return None, None
+
+    def save_currency_sample(self, crop, value):
+        try:
+            os.makedirs(self.CURRENCY_SAMPLES_DIR, exist_ok=True)
+            path = os.path.join(self.CURRENCY_SAMPLES_DIR, f"{value}_{time.time_ns()}.png")
+            cv2.imwrite(path, crop)
+        except Exception as e:
+            print("[WARN] Could not save currency sample:", e)
+
+    def keyword_anchor(self, frame, keyword):
+        verifier, anchor = self.keywords[keyword]
+        detected, _, anchor_loc = self.known_match(frame, anchor)
+
+        # Both anchors live in top_right, the region the keyword is read from
+        return verifier, frame.region("top_right"), anchor_loc if detected else None
+
+    def detect_keyword(self, frame, keyword, line_text=None):
+        verifier, region, anchor_loc = self.keyword_anchor(frame, keyword)
+        return verifier.verify(region, anchor_loc, line_text=line_text)
+
+    def keyword_line(self, frame, keyword):
+        # -> the crop detect_keyword() would line-OCR, or None
+        verifier, region, anchor_loc = self.keyword_anchor(frame, keyword)
+        return verifier.line_roi(region, anchor_loc)
+
+    def detect_findings_text(self, frame, line_text=None):
+        return self.detect_keyword(frame, "FINDINGS", line_text=line_text)
+
+    def detect_raider_text(self, frame):
+        return self.detect_keyword(frame, "RAIDER")
+
+    # -----------------------------
+    # DETECTOR STAGES
+    # -----------------------------
+
+    def capture_frame(self, source):
+        started = time.perf_counter()
+
+        frame = source.grab()
+        if frame is None:
+            return None
+
+        metrics.observe("capture.grab", time.perf_counter() - started)
+        metrics.count("detector.ticks")
+
+        frame.seq = self.next_seq
+        self.next_seq += 1
+
+        frame.marks["grab"] = started
+
+        with metrics.time("capture.gate"):
+            frame.changed = self.gate.check(frame)
+        frame.templates, frame.wanted_reads, frame.sweep = self.lifecycle.plan()
+
+        keys = set(self.loaded_templates) if frame.templates is None else set(frame.templates)
+        keys |= set(frame.wanted_reads)
+        frame.due = self.scheduler.select(keys, force=frame.sweep)
+        frame.mark("captured")
+        return frame
+
+    def known_match(self, frame, name):
+        return frame.matches.get(name, self.last_matches.get(name, (False, 0, (0, 0))))
+
+    def stale(self, key, region_changed, have_result):
+        # -> True when key has to be evaluated on this frame. A key the
+        # scheduler holds back while its region changed is remembered as
+        # dirty, since the change gate will not flag that change again.
+        if not have_result:
+            self.dirty.discard(key)
+            return True
+
+        if not region_changed and key not in self.dirty:
+            self.gate.note_skip("match" if key in self.loaded_templates else "ocr")
+            return False
+
+        return True
+
+    def due(self, frame, key, have_result):
+        if have_result and not frame.is_due(key):
+            self.dirty.add(key)
+            self.gate.note_skip("schedule")
+            return False
+
+        self.dirty.discard(key)
+        return True
+
+    def templates_due(self, frame):
+        names = []
+
+        for name, data in self.loaded_templates.items():
+            if frame.templates is not None and name not in frame.templates:
+                self.gate.note_skip("phase")
+                continue
+
+            # Unchanged region and a result we still hold: nothing to do.
+            # Templates the previous phase did not track are re-evaluated.
+            have_result = name in self.last_matches
+
+            if not self.stale(name, frame.changed[data["region"]], have_result):
+                continue
+
+            if not self.due(frame, name, have_result):
+                continue
+
+            names.append(name)
+
+        return names
+
+    def match_frame(self, frame):
+        frame.mark("match_start")
+
+        names = self.templates_due(frame)
+
+        slot = self.pool.acquire(frame.gray) if self.pool is not None and names else None
+
+        if slot is not None:
+            try:
+                self.match_in_pool(frame, names, slot)
+            finally:
+                self.pool.release(slot)
+
+            frame.mark("matched")
+            return
+
+        for name in names:
+            data = self.loaded_templates[name]
+
+            with metrics.time(f"match.{name}"):
+                frame.matches[name] = self.match_template(
+                    frame.region(data["region"]),
+                    data["image"],
+                    template_name=name
+                )
+
+        frame.mark("matched")
+
+    def match_in_pool(self, frame, names, slot):
+        # Same decisions as the in-process path: tracked windows first, a
+        # full-region scan for every miss. All jobs of a round run
+        # concurrently across the worker processes.
+        windows = {}
+        full = []
+
+        for name in names:
+            screen_img = frame.region(self.loaded_templates[name]["region"])
+            found = self.tracker.window_for(name, screen_img, self.footprints[name])
+
+            if found is None:
+                full.append(name)
+                continue
+
+            window, origin = found
+            windows[name] = (self.pool.submit(slot, view_rect(frame.gray, window), name), origin)
+
+        full_jobs = {
+            name: self.pool.submit(slot, view_rect(frame.gray, frame.region(self.loaded_templates[name]["region"])), name)
+            for name in full
+        }
+
+        try:
+            for name, (future, origin) in windows.items():
+                detected, val, loc, seconds = future.result()
+                metrics.observe(f"match.{name}", seconds)
+
+                result = self.tracker.record_window(name, (detected, val, loc), origin)
+
+                if result is not None:
+                    frame.matches[name] = result
+                else:
+                    region = frame.region(self.loaded_templates[name]["region"])
+                    full_jobs[name] = self.pool.submit(slot, view_rect(frame.gray, region), name)
+
+            for name, future in full_jobs.items():
+                detected, val, loc, seconds = future.result()
+                metrics.observe(f"match.full.{name}", seconds)
+
+                frame.matches[name] = self.tracker.record_full(name, (detected, val, loc))
+        finally:
+            # The slot is reused once released: wait out every job on it
+            wait([future for future, _ in windows.values()] + list(full_jobs.values()))
+
+    def read_frame(self, frame):
+        frame.mark("read_start")
+
+        read_currency = (
+            frame.wants("currency")
+            and "currency_icon" in self.loaded_templates
+            and self.stale("currency", frame.changed["top_left"], self.currency_fresh)
+            and self.due(frame, "currency", self.currency_fresh)
+        )
+
+        # FINDINGS text is only worth reading while the end-round panel is
+        # up and this round has not been snapshotted yet
+        read_findings = False
+
+        if (
+            frame.wants("findings_text")
+            and self.known_match(frame, "end_round_findings")[0]
+            and not self.findings_snapshot_taken
+        ):
+            have_result = self.last_findings_text is not None
+
+            read_findings = (
+                self.stale("findings_text", frame.changed["top_right"], have_result)
+                and self.due(frame, "findings_text", have_result)
+            )
+
+        if not read_currency:
+            if read_findings:
+                frame.set_read("findings_text", self.detect_findings_text(frame))
+
+            frame.mark("read")
+            return
+
+        # Both reads on one frame: the FINDINGS line crop rides along in
+        # the currency OCR batch
+        line = self.keyword_line(frame, "FINDINGS") if read_findings else None
+
+        values, texts = self.read_currency_batch(
+            [self.currency_crop(
+                frame.region("top_left"),
+                self.loaded_templates["currency_icon"]["image"],
+                icon_match=self.known_match(frame, "currency_icon")
+            )],
+            [(line, "keyword")] if line is not None else []
+        )
+        frame.set_read("currency", values[0])
+
+        if read_findings:
+            frame.set_read("findings_text", self.detect_findings_text(
+                frame,
+                line_text=texts[0] if line is not None else None
+            ))
+
+        frame.mark("read")
+
+    def apply_frame(self, frame):
+        # Regions that did not change keep their previous results; templates
+        # the current phase does not track are dropped.
+        frame.mark("apply_start")
+        started = frame.marks["apply_start"]
+
+        # Only reads made on this frame go into the history: a read merged
+        # in from a dropped frame describes that frame's pixels, not these
+        own = frame.own_reads()
+        self.history.push(frame, {"currency": own["currency"]} if "currency" in own else None)
+
+        self.last_matches.update(frame.matches)
+
+        if frame.templates is not None:
+            for name in list(self.last_matches):
+                if name not in frame.templates:
+                    del self.last_matches[name]
+
+        current_state = {name: match[0] for name, match in self.last_matches.items()}
+
+        # Feed results back to the scheduler; keys that were due but
+        # skipped by the change gate count as unchanged
+        for name in frame.matches:
+            self.scheduler.report(name, current_state.get(name) != self.previous_state.get(name))
+
+        if "currency" in frame.reads:
+            self.scheduler.report("currency", frame.reads["currency"] != self.last_currency_read)
+        if "findings_text" in frame.reads:
+            self.scheduler.report("findings_text", frame.reads["findings_text"] != self.last_findings_text)
+
+        if frame.due is not None:
+            for key in frame.due:
+                if key not in frame.matches and key not in frame.reads:
+                    self.scheduler.report(key, False)
+
+        if "currency" in frame.reads:
+            self.last_currency_read = frame.reads["currency"]
+            self.currency_fresh = True
+        elif not frame.wants("currency"):
+            self.currency_fresh = False
+        currency = self.last_currency_read
+
+        if "findings_text" in frame.reads:
+            self.last_findings_text = frame.reads["findings_text"]
+        elif frame.changed["top_right"] or not frame.wants("findings_text"):
+            self.last_findings_text = None
+
+        # Only templates evaluated on this frame that actually flipped; a
+        # template (re)entering the phase's set starts from not detected
+        changes = [
+            (name, current_state[name])
+            for name in frame.matches
+            if name in current_state and current_state[name] != self.previous_state.get(name, False)
+        ]
+
+        if changes:
+            print(f"\n[{datetime.now().strftime('%H:%M:%S')}] STATE CHANGE")
+            for name, detected in changes:
+                print(f"  - {name}: {'DETECTED' if detected else 'LOST'}")
+
+        transition = self.lifecycle.advance(current_state, self.previous_state, sweep=frame.sweep)
+
+        if transition is not None:
+            _, phase = transition
+            self.scheduler.pin(PHASES[phase].watched)
+            self.scheduler.burst(PHASES[phase].burst)
+
+            if phase == LOADOUT_LOCKED:
+                # New round: the cost is the currency shown right before READY
+                self.loadout_value_snapshot = None
+
+                cost, source_seq = self.snapshot_currency(frame, include_frame=False)
+                if cost is None:
+                    cost, source_seq = self.previous_currency, None
+
+                if cost is not None:
+                    if cost == 100:
+                        print("[INFO] Free kit detected (100). Adjusting cost to 0.")
+                        cost = 0
+                    self.loadout_cost_snapshot = cost
+                    print(f"\n[SNAPSHOT] LOADOUT COST LOCKED: {self.loadout_cost_snapshot} {self.snapshot_source(frame, source_seq)}")
+
+            if phase == END_ROUND:
+                self.findings_snapshot_taken = False
+
+        if (
+            self.lifecycle.phase == END_ROUND
+            and current_state.get("currency_icon", False)
+            and current_state.get("end_round_findings", False)
+            and self.last_findings_text
+            and self.loadout_cost_snapshot is not None
+        ):
+            if not self.findings_snapshot_taken:
+
+                value, source_seq = self.snapshot_currency(frame)
+                if value is None:
+                    value, source_seq = currency, None
+
+                if value is not None:
+                    self.loadout_value_snapshot = value
+                    print(f"[SNAPSHOT] LOADOUT VALUE {self.snapshot_source(frame, source_seq)}")
+
+                    print("\n================ RUN SNAPSHOT ================")
+                    print(f"LOADOUT COST  : {self.loadout_cost_snapshot}")
+                    print(f"LOADOUT VALUE : {self.loadout_value_snapshot}")
+                    print(f"PROFIT        : {self.loadout_value_snapshot - self.loadout_cost_snapshot}")
+                    print("==============================================\n")
+
+                    self.findings_snapshot_taken = True
+
+        if not current_state.get("end_round_findings", False):
+            self.findings_snapshot_taken = False
+
+        if (
+            current_state.get("show_app", False)
+            and not self.previous_state.get("show_app", False)
+        ):
+            if self.callback:
+                self.callback("show_app")
+
+        if currency is not None and currency != self.previous_currency:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] LOADOUT VALUE: {currency}")
+            self.previous_currency = currency
+
+        self.previous_state = current_state.copy()
+
+        metrics.observe("detector.apply", time.perf_counter() - started)
+
+        frame.mark("applied")
+        self.latency.record(frame)
+
+        if self.on_first_frame is not None:
+            on_first_frame, self.on_first_frame = self.on_first_frame, None
+            on_first_frame()
 
     def _run(self):
-        with mss.mss() as sct:
+        self.open_match_pool()
+
+        with self.open_frame_source() as source:
+            self.scheduler.set_clock(source.clock)
             print("[STARTED] Detector running...\n")
 
             while self.running:
 
-                if time.time() < self.cooldown_until:
-                    time.sleep(0.2)
+                if self.wait_for_cooldown():
                     continue
 
-                current_state = {}
-
-                for name, data in self.loaded_templates.items():
-                    region = self.REGIONS[data["region"]]
-                    screen_img = self.grab_region(sct, region)
-
-                    detected, confidence, location = self.match_template(
-                        screen_img,
-                        data["image"],
-                        template_name=name
-                    )
-
-                    current_state[name] = detected
-
-                if current_state != self.previous_state:
-                    print(f"\n[{datetime.now().strftime('%H:%M:%S')}] STATE CHANGE")
-                    for name in current_state:
-                        if self.previous_state.get(name) != current_state[name]:
-                            status = "DETECTED" if current_state[name] else "LOST"
-                            print(f"  - {name}: {status}")
-
-                if current_state.get("ready", False) and not self.previous_state.get("ready", False):
-                    if self.previous_currency is not None:
-                        cost = self.previous_currency
-                        if cost == 100:
-                            print("[INFO] Free kit detected (100). Adjusting cost to 0.")
-                            cost = 0
-                        self.loadout_cost_snapshot = cost
-                        print(f"\n[SNAPSHOT] LOADOUT COST LOCKED: {self.loadout_cost_snapshot}")
-
-                if (
-                    current_state.get("currency_icon", False)
-                    and current_state.get("end_round_findings", False)
-                    and self.detect_findings_text(sct)
-                    and self.loadout_cost_snapshot is not None
-                ):
-                    if not self.findings_snapshot_taken:
-
-                        top_left_img = self.grab_region(sct, self.REGIONS["top_left"])
-                        currency_now = self.extract_currency_from_icon(
-                            top_left_img,
-                            self.loaded_templates["currency_icon"]["image"]
-                        )
-
-                        if currency_now is not None:
-                            self.loadout_value_snapshot = currency_now
-
-                            print("\n================ RUN SNAPSHOT ================")
-                            print(f"LOADOUT COST  : {self.loadout_cost_snapshot}")
-                            print(f"LOADOUT VALUE : {self.loadout_value_snapshot}")
-                            print(f"PROFIT        : {self.loadout_value_snapshot - self.loadout_cost_snapshot}")
-                            print("==============================================\n")
-
-                            self.findings_snapshot_taken = True
-
-                if not current_state.get("end_round_findings", False):
-                    self.findings_snapshot_taken = False
-
-                if (
-                    current_state.get("show_app", False)
-                    and not self.previous_state.get("show_app", False)
-                ):
-                    if self.callback:
-                        self.callback("show_app")
-
-                top_left_img = self.grab_region(sct, self.REGIONS["top_left"])
-                currency = self.extract_currency_from_icon(
-                    top_left_img,
-                    self.loaded_templates["currency_icon"]["image"]
-                )
+                frame = self.capture_frame(source)
+                if frame is None:
+                    print("[STOPPED] Frame source exhausted")
+                    self.running = False
+                    break
+
+                self.match_frame(frame)
+                self.read_frame(frame)
+                self.apply_frame(frame)
+
+                self.wait_for_next_tick(source)
+
+        self.close()
+
+
+# -----------------------------
+# REPLAY
+# -----------------------------
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay a recorded session through the detector")
+    parser.add_argument("recording", help="file written with ARC_RECORD set")
+    parser.add_argument("--realtime", action="store_true", help="replay at recorded speed")
+    parser.add_argument("--serial", action="store_true", help="single-threaded loop instead of the pipeline")
+    args = parser.parse_args()
+
+    def replay_callback(state):
+        print(f"[CALLBACK] {state} snapshots={detector.get_snapshots()}")
+
+    detector = MatchDetector(
+        replay_callback,
+        lambda: False,
+        frame_source=ReplayFrameSource(args.recording, realtime=args.realtime)
+    )
+    detector.RECORD_PATH = None
+    detector.PIPELINE_ENABLED = not args.serial
+
+    # Same threads as live, on the recording's clock
+    detector.start()
 
-                if currency is not None and currency != self.previous_currency:
-                    print(f"[{datetime.now().strftime('%H:%M:%S')}] LOADOUT VALUE: {currency}")
-                    self.previous_currency = currency
+    if detector.pipeline is not None:
+        detector.pipeline.join()
+    else:
+        while detector.running:
+            time.sleep(0.1)
 
-                self.previous_state = current_state.copy()
-                time.sleep(self.CHECK_INTERVAL)
\ No newline at end of file
+    print(f"[REPLAY] Final snapshots: {detector.get_snapshots()}")
+    print(f"[REPLAY] Phase: {detector.get_phase()}")
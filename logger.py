@@ -1,8 +1,12 @@
-import gspread
-from gspread.utils import ValueInputOption
-from google.oauth2.service_account import Credentials
 from datetime import datetime
+import json
 import os
+import tempfile
+import threading
+import time
+
+from metrics import metrics
+from outbox import DATA_DIR
 
 
 # -----------------------------
@@ -14,37 +18,168 @@ SCOPES = [
     "https://www.googleapis.com/auth/drive"
 ]
 
-keys_dir = os.environ.get("KEYS_DIR")
+SPREADSHEET_ID = "1VlU4IgJjKn9-k7MJB7a-mexiE9QkY8jNah54mg6EiS4"
 
-if not keys_dir:
-    raise RuntimeError("KEYS_DIR environment variable not set.")
 
-cred_path = os.path.join(keys_dir, "credentials", "credentials.json")
+def credentials_path():
+    keys_dir = os.environ.get("KEYS_DIR")
 
-if not os.path.exists(cred_path):
-    raise FileNotFoundError(f"Credentials file not found at: {cred_path}")
+    if not keys_dir:
+        raise RuntimeError("KEYS_DIR environment variable not set.")
 
-creds = Credentials.from_service_account_file(
-    cred_path,
-    scopes=SCOPES
-)
+    cred_path = os.path.join(keys_dir, "credentials", "credentials.json")
 
-client = gspread.authorize(creds)
+    if not os.path.exists(cred_path):
+        raise FileNotFoundError(f"Credentials file not found at: {cred_path}")
 
-SPREADSHEET_ID = "1VlU4IgJjKn9-k7MJB7a-mexiE9QkY8jNah54mg6EiS4"
+    return cred_path
+
+
+class SheetConnection:
+
+    # Authorizes and opens the spreadsheet on a background thread instead
+    # of at import, so the overlay and detector start without waiting on
+    # (or failing over) the network. The gspread client keeps one
+    # authorized HTTP session for the whole run: connections are reused
+    # and the service-account token is refreshed by the session before it
+    # expires. A failed attempt is retried by the next sheet() call.
+
+    TIMEOUT = 30
+
+    def __init__(self, spreadsheet_id=SPREADSHEET_ID):
+        self.spreadsheet_id = spreadsheet_id
+
+        self.spreadsheet = None
+        self.worksheet = None
+        self.error = None
+        self.connect_seconds = None
+
+        self.ready = threading.Event()
+        self.attempt_done = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.ready.is_set() or (self.thread is not None and self.thread.is_alive()):
+                return
+
+            self.attempt_done.clear()
+            self.thread = threading.Thread(target=self.connect, name="sheet-connect", daemon=True)
+            self.thread.start()
+
+    def connect(self):
+        started = time.perf_counter()
+
+        try:
+            # Imported here, on the connect thread: gspread and the Google
+            # auth stack are the slowest imports of the app
+            import gspread
+            from google.oauth2.service_account import Credentials
+
+            creds = Credentials.from_service_account_file(
+                credentials_path(),
+                scopes=SCOPES
+            )
+
+            client = gspread.authorize(creds)
+
+            spreadsheet = client.open_by_key(self.spreadsheet_id)
+            worksheet = spreadsheet.sheet1
+
+            # Warm-up: the first write should not pay for the cursor check
+            row_cursor.next_row(worksheet)
 
-spreadsheet = client.open_by_key(SPREADSHEET_ID)
-sheet = spreadsheet.sheet1
+        except Exception as e:
+            self.error = e
+            print("[SHEET] Connection failed:", e)
+            self.attempt_done.set()
+            return
 
-print("Connected to spreadsheet:", spreadsheet.url)
+        self.spreadsheet = spreadsheet
+        self.worksheet = worksheet
+        self.error = None
+        self.connect_seconds = time.perf_counter() - started
+        metrics.observe("sheets.connect", self.connect_seconds)
+
+        self.ready.set()
+        self.attempt_done.set()
+
+        print(f"Connected to spreadsheet: {spreadsheet.url} ({self.connect_seconds * 1000:.0f} ms)")
+
+    def sheet(self, timeout=TIMEOUT):
+        # -> the worksheet, connecting first if needed; raises when the
+        # connection cannot be made
+        if not self.ready.is_set():
+            self.start()
+            self.attempt_done.wait(timeout)
+
+        if not self.ready.is_set():
+            raise self.error or TimeoutError("Spreadsheet connection timed out")
+
+        return self.worksheet
+
+
+connection = SheetConnection()
 
 
 # -----------------------------
-# LOG MATCH FUNCTION
+# ROW CURSOR
 # -----------------------------
 
-def log_match(cost, loot_value, kills, weapon, initiated_fight, notes):
-    try:
+CURSOR_PATH = os.path.join(DATA_DIR, "sheet_cursor.json")
+
+
+def is_filled(row):
+    return bool(row) and any(cell != "" for cell in row)
+
+
+class RowCursor:
+
+    # Next empty row of the sheet (raid number = row - 1), kept on disk so
+    # a write goes straight to its row instead of downloading A2:H to find
+    # it. External edits are caught by a two-row probe (last written row
+    # filled, cursor row empty) on the first write of a run and then every
+    # RECONCILE_EVERY rows; only a failed probe rescans the sheet.
+
+    RECONCILE_EVERY = 20
+
+    def __init__(self, path=CURSOR_PATH, spreadsheet_id=SPREADSHEET_ID):
+        self.path = path
+        self.spreadsheet_id = spreadsheet_id
+
+        self.row = None
+        self.since_check = 0
+        self.checked = False
+
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get("spreadsheet") == self.spreadsheet_id:
+            self.row = data["next_row"]
+            self.since_check = data.get("since_check", 0)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "spreadsheet": self.spreadsheet_id,
+                "next_row": self.row,
+                "since_check": self.since_check,
+            }, f)
+
+        os.replace(tmp, self.path)
+
+    def rescan(self, sheet):
         # Only check columns A–H starting from row 2
         data = sheet.get("A2:H")
 
@@ -52,33 +187,106 @@ def log_match(cost, loot_value, kills, weapon, initiated_fight, notes):
 
         for i, row in enumerate(data):
             # If row is empty OR all cells are empty
-            if not row or all(cell == "" for cell in row):
+            if not is_filled(row):
                 next_row = i + 2
                 break
         else:
             next_row = len(data) + 2
 
-        raid_number = next_row - 1
+        if self.row is not None and self.row != next_row:
+            print(f"[SHEET] Row cursor moved {self.row} -> {next_row} (sheet edited)")
+
+        self.row = next_row
+
+    def probe(self, sheet):
+        # Row above the cursor must be filled (row 1 is the header), the
+        # cursor row must be empty
+        if self.row <= 2:
+            return not is_filled((sheet.get("A2:H2") or [[]])[0])
+
+        data = sheet.get(f"A{self.row - 1}:H{self.row}")
+
+        above = data[0] if len(data) > 0 else []
+        at = data[1] if len(data) > 1 else []
+
+        return is_filled(above) and not is_filled(at)
+
+    def next_row(self, sheet):
+        if self.row is None:
+            self.rescan(sheet)
+        elif not self.checked or self.since_check >= self.RECONCILE_EVERY:
+            if not self.probe(sheet):
+                self.rescan(sheet)
+
+        self.checked = True
+        if self.since_check >= self.RECONCILE_EVERY:
+            self.since_check = 0
+
+        return self.row
+
+    def advance(self, count):
+        self.row += count
+        self.since_check += count
+        self.save()
 
-        row_data = [
-            raid_number,
-            weapon,
-            cost,
-            kills,
-            loot_value,
-            "",  # Reserved column (F)
-            initiated_fight,
-            notes
-        ]
 
+row_cursor = RowCursor()
+
+
+# -----------------------------
+# LOG MATCH FUNCTION
+# -----------------------------
+
+def sheet_values(record, row):
+    return [
+        row - 1,  # Raid number
+        record["weapon"],
+        record["cost"],
+        record["kills"],
+        record["loot_value"],
+        "",  # Reserved column (F)
+        record["initiated_fight"],
+        record["notes"]
+    ]
+
+
+def write_matches(records):
+    # Writes a batch of match records (oldest first) at the row cursor in
+    # one update. Raises on failure so the caller can retry.
+    # -> the sheet row of every record
+    sheet = connection.sheet()
+    next_row = row_cursor.next_row(sheet)
+
+    rows = list(range(next_row, next_row + len(records)))
+    last_row = rows[-1]
+
+    with metrics.time("sheets.write"):
         sheet.update(
-            range_name=f"A{next_row}:H{next_row}",
-            values=[row_data],
-            value_input_option=ValueInputOption.user_entered
+            range_name=f"A{next_row}:H{last_row}",
+            values=[sheet_values(record, row) for record, row in zip(records, rows)],
+            value_input_option="USER_ENTERED"
         )
 
+    metrics.count("sheets.rows_written", len(records))
+
+    row_cursor.advance(len(records))
+    print("Written to rows:", next_row, "-", last_row)
+
+    return rows
+
+
+def log_match(cost, loot_value, kills, weapon, initiated_fight, notes):
+    try:
+        write_matches([{
+            "cost": cost,
+            "loot_value": loot_value,
+            "kills": kills,
+            "weapon": weapon,
+            "initiated_fight": initiated_fight,
+            "notes": notes,
+        }])
+
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Match logged.")
-        print("Written to row:", next_row)
 
     except Exception as e:
         print("Failed to log match:", e)
@@ -1,24 +1,47 @@
 # logic.py
 
+from datetime import datetime, timedelta
+
+from analytics import SessionAnalytics
 from logger import log_match
 
 # These will be injected from main.py
 root_window = None
 detector_instance = None
+match_writer = None
+match_store = None
+
+session = SessionAnalytics()
 
-session = {
-    "matches": 0,
-    "extracts": 0,
-    "deaths": 0,
-    "profit": 0.0,
-    "kills": 0
-}
+# A restart continues the current session; a break longer than this
+# between matches (or since the last one) starts a new one
+SESSION_IDLE_GAP = timedelta(hours=2)
 
 
-def initialize(root, detector):
-    global root_window, detector_instance
+def initialize(root, detector, writer=None, store=None):
+    global root_window, detector_instance, match_writer, match_store
     root_window = root
     detector_instance = detector
+    match_writer = writer
+    match_store = store
+
+
+def restore_session(stats_text):
+    # The session survives a restart: replayed once from the local store
+    if match_store is not None:
+        started_at, matches = match_store.resume_session(SESSION_IDLE_GAP)
+        session.reset(started_at)
+
+        for match in matches:
+            session.add(
+                match["cost"],
+                match["loot_value"],
+                match["kills"],
+                match["weapon"],
+                at=datetime.fromisoformat(match["logged_at"])
+            )
+
+    update_stats_display(stats_text)
 
 
 def parse_value(value: str) -> float:
@@ -44,31 +67,50 @@ def parse_value(value: str) -> float:
         return 0.0
 
 
+def format_streak(streak):
+    if streak > 0:
+        return f"{streak} extract{'s' if streak > 1 else ''}"
+    if streak < 0:
+        return f"{-streak} death{'s' if streak < -1 else ''}"
+    return "-"
+
+
 def update_stats_display(stats_text):
-    matches = session["matches"]
-    extracts = session["extracts"]
-    deaths = session["deaths"]
-    profit = session["profit"]
-    kills = session["kills"]
+    stats = session.snapshot()
+
+    lines = [
+        f"Matches: {stats['matches']}",
+        f"Extracts: {stats['extracts']}",
+        f"Deaths: {stats['deaths']}",
+        f"Win Rate: {stats['win_rate'] * 100:.1f}%",
+        f"Total Profit: {stats['profit']:,.0f}",
+        f"Profit/h: {stats['profit_per_hour']:,.0f}",
+        f"Total Kills: {stats['kills']}",
+    ]
 
-    winrate = (extracts / matches * 100) if matches else 0
+    if stats["recent_count"]:
+        lines.append(
+            f"Last {stats['recent_count']}: {stats['recent_win_rate'] * 100:.0f}% "
+            f"{stats['recent_profit']:,.0f}"
+        )
 
-    stats_text.set(
-        f"Matches: {matches}\n\n"
-        f"Extracts: {extracts}\n\n"
-        f"Deaths: {deaths}\n\n"
-        f"Win Rate: {winrate:.1f}%\n\n"
-        f"Total Profit: {profit:,.0f}\n\n"
-        f"Total Kills: {kills}"
-    )
+    lines.append(f"Streak: {format_streak(stats['streak'])}")
+
+    best = stats["best_weapon"]
+    if best is not None:
+        weapon = stats["weapons"][best]
+        lines.append(f"Best: {best} {weapon['extract_rate'] * 100:.0f}% ROI {weapon['roi'] * 100:.0f}%")
+
+    stats_text.set("\n".join(lines))
 
 
 def reset_session(stats_text):
-    session["matches"] = 0
-    session["extracts"] = 0
-    session["deaths"] = 0
-    session["profit"] = 0.0
-    session["kills"] = 0
+    started_at = datetime.now()
+
+    if match_store is not None:
+        match_store.reset_session(started_at)
+
+    session.reset(started_at)
     update_stats_display(stats_text)
 
 
@@ -79,26 +121,28 @@ def submit(cost_entry, loot_entry, kills_entry,
     loot_value = parse_value(loot_entry.get())
     kills = int(parse_value(kills_entry.get()))
 
-    profit = loot_value - cost
-
     weapon = weapon_entry.get().strip() or "Unknown"
     notes = notes_entry.get().strip()
     initiated_fight = "Y" if fight_var.get() else "N"
 
-    died = loot_value == 0
-
-    session["matches"] += 1
-    session["profit"] += profit
-    session["kills"] += kills
-
-    if died:
-        session["deaths"] += 1
-    else:
-        session["extracts"] += 1
+    session.add(cost, loot_value, kills, weapon)
 
     update_stats_display(stats_text)
 
-    log_match(cost, loot_value, kills, weapon, initiated_fight, notes)
+    # Stored locally and synced to the sheet by the background writer;
+    # written inline only when there is none
+    if match_writer is not None:
+        match_writer.submit({
+            "cost": cost,
+            "loot_value": loot_value,
+            "kills": kills,
+            "weapon": weapon,
+            "initiated_fight": initiated_fight,
+            "notes": notes,
+            "logged_at": datetime.now().isoformat(timespec="seconds"),
+        })
+    else:
+        log_match(cost, loot_value, kills, weapon, initiated_fight, notes)
 
     # CLEAR FIELDS
     cost_entry.delete(0, "end")
@@ -1,14 +1,29 @@
+import time
+
+STARTED_AT = time.perf_counter()
+
 import tkinter as tk
 import threading
 
+# Only what the window needs comes in up front; the detector stack (cv2,
+# numpy, pytesseract, mss), gspread and the tray load in the background
 from ui import build_ui
-from tray import setup_tray
 from hotkeys import start_hotkey_listener, unregister_hotkey
-from detector import MatchDetector
-from logic import initialize
+from logic import initialize, restore_session, update_stats_display
+from logger import connection, write_matches
+from metrics import MetricsDumper, metrics
+from outbox import Outbox, SheetsWriter
+from startup import StartupTimer
+from store import MatchStore
 import os
 import subprocess
 
+timer = StartupTimer(STARTED_AT)
+timer.mark("imports")
+
+# The launch is saved once the last of these has been marked
+FINAL_PHASES = ("first detection", "archive synced")
+
 # checking for arc
 import os
 import subprocess
@@ -34,6 +49,9 @@ def launch_arc_if_not_running():
     except Exception as e:
         print("[ERROR] Failed to launch ARC Raiders:", e)
 def main():
+    # Spreadsheet auth + open runs in the background from here on
+    connection.start()
+
     root = tk.Tk()
 
     # Auto-launch ARC if needed
@@ -85,15 +103,27 @@ def main():
         else:
             show_window()
             
-    cost_entry, loot_entry, kills_entry, stats_text = build_ui(root, toggle_window)
+    cost_entry, loot_entry, kills_entry, stats_text, sync_text = build_ui(root, toggle_window)
+    timer.mark("window built")
 
     # ----------------------------
     # CLEAN SHUTDOWN
     # ----------------------------
 
+    # Set by the background loader once the detector is built
+    detector = None
+    closing = False
+
     def shutdown():
+        nonlocal closing
+        closing = True
+
         unregister_hotkey()
-        detector.stop()
+        if detector is not None:
+            detector.stop()
+        writer.stop(timeout=2)
+        dumper.stop()
+        timer.save()
         root.destroy()
 
     root.protocol("WM_DELETE_WINDOW", shutdown)
@@ -113,10 +143,49 @@ def main():
     # SYSTEM TRAY THREAD
     # ----------------------------
 
-    threading.Thread(
-        target=lambda: setup_tray(show_window, shutdown),
-        daemon=True
-    ).start()
+    def run_tray():
+        from tray import setup_tray
+        setup_tray(show_window, shutdown)
+
+    threading.Thread(target=run_tray, daemon=True).start()
+
+    # ----------------------------
+    # SHEET WRITER
+    # ----------------------------
+
+    # Local match store is the system of record; the sheet is synced from it
+    store = MatchStore()
+    store.import_outbox(Outbox())
+
+    writer = SheetsWriter(
+        store,
+        write_matches,
+        on_status=lambda status: root.after(0, lambda: sync_text.set(status))
+    )
+
+    # Matches can be logged by hand before the detector is up
+    initialize(root, None, writer, store)
+    restore_session(stats_text)
+
+    # Profit/h moves with the clock, not only on submit
+    def refresh_stats():
+        update_stats_display(stats_text)
+        root.after(60000, refresh_stats)
+
+    root.after(60000, refresh_stats)
+
+    writer.start()
+    timer.mark("store ready")
+
+    # ----------------------------
+    # METRICS
+    # ----------------------------
+
+    # Timings / counters appended to data/metrics.jsonl + .csv every minute
+    metrics.add_source("sheets", writer.stats)
+
+    dumper = MetricsDumper()
+    dumper.start()
 
     # ----------------------------
     # DETECTOR CALLBACK
@@ -144,20 +213,50 @@ def main():
         return is_visible
 
     # ----------------------------
-    # DETECTOR SETUP
+    # BACKGROUND LOADER
     # ----------------------------
 
-    detector = MatchDetector(
-        detector_callback,
-        is_app_visible
-    )
+    def first_detection():
+        timer.mark("first detection")
+        timer.save_when(*FINAL_PHASES)
 
-    initialize(root, detector)
+    def start_detector(loaded):
+        nonlocal detector
 
-    detector.start()
+        if closing:
+            return
+
+        detector = loaded
+        initialize(root, detector, writer, store)
+        detector.start()
+        timer.mark("detector started")
+
+    def load_in_background():
+        from detector import MatchDetector
+        timer.mark("detector imported")
+
+        loaded = MatchDetector(
+            detector_callback,
+            is_app_visible
+        )
+        loaded.on_first_frame = first_detection
+        timer.mark("detector ready")
+
+        if not closing:
+            root.after(0, lambda: start_detector(loaded))
+
+        # Bring the columnar history archive up to date
+        from archive import MatchArchive
+        MatchArchive().sync_from_store(store)
+        timer.mark("archive synced")
+        timer.save_when(*FINAL_PHASES)
+
+    threading.Thread(target=load_in_background, name="startup-loader", daemon=True).start()
 
     cost_entry.focus_set()
 
+    root.after_idle(lambda: timer.mark("interactive"))
+
     root.mainloop()
 
 
@@ -0,0 +1,282 @@
+# match_pool.py
+
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+
+# -----------------------------
+# SHARED FRAME RING
+# -----------------------------
+
+class FrameRing:
+
+    # Frame-sized slots in one shared memory block. A frame is copied into
+    # a free slot once; worker processes map the same block and read
+    # regions straight out of it, so no pixels are pickled. acquire()
+    # blocks until a slot is free, so a slot is never rewritten while jobs
+    # on it are in flight.
+
+    def __init__(self, shape, slots):
+        self.shape = tuple(shape)
+        self.slots = slots
+
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * self.shape[0] * self.shape[1])
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+        self.free = queue.Queue()
+        for slot in range(slots):
+            self.free.put(slot)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def acquire(self, gray):
+        # -> slot holding a copy of gray, or None when it does not fit
+        if gray.shape != self.shape:
+            return None
+
+        slot = self.free.get()
+        self.frames[slot] = gray
+        return slot
+
+    def release(self, slot):
+        self.free.put(slot)
+
+    def close(self):
+        self.frames = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def view_rect(base, view):
+    # (x, y, w, h) of a 2-D view into the C-contiguous array base
+    offset = view.__array_interface__["data"][0] - base.__array_interface__["data"][0]
+    y, x = divmod(offset, base.strides[0])
+    return x, y, view.shape[1], view.shape[0]
+
+
+# -----------------------------
+# WORKER PROCESS
+# -----------------------------
+
+# Per-process state, set up once by init_worker
+worker = {}
+
+
+def init_worker(shm_name, shape, slots, templates, pyramids, threshold):
+    # Templates arrive once per worker (pickled with the initializer), not
+    # with every job. Spawned workers share the parent's resource tracker,
+    # so attaching does not take ownership: the ring unlinks the block.
+    shm = shared_memory.SharedMemory(name=shm_name)
+
+    worker["shm"] = shm
+    worker["frames"] = np.ndarray((slots,) + tuple(shape), dtype=np.uint8, buffer=shm.buf)
+    worker["templates"] = templates
+    worker["pyramids"] = pyramids
+    worker["threshold"] = threshold
+
+    # One core per process: parallelism comes from the pool
+    cv2.setNumThreads(1)
+
+
+def ping(delay):
+    # Busy long enough that every worker has to take one
+    time.sleep(delay)
+    return os.getpid()
+
+
+def match_job(slot, rect, name):
+    # -> (detected, val, loc, seconds), loc relative to rect. Same
+    # decision as MatchDetector.match_region.
+    started = time.perf_counter()
+
+    x, y, w, h = rect
+    img = worker["frames"][slot, y:y + h, x:x + w]
+
+    if name in worker["pyramids"]:
+        pyramid, threshold = worker["pyramids"][name]
+        detected, val, loc = pyramid.match(img, threshold)
+    else:
+        result = cv2.matchTemplate(img, worker["templates"][name], cv2.TM_CCOEFF_NORMED)
+        _, val, _, loc = cv2.minMaxLoc(result)
+        detected = val >= worker["threshold"]
+
+    return bool(detected), float(val), (int(loc[0]), int(loc[1])), time.perf_counter() - started
+
+
+# -----------------------------
+# POOL
+# -----------------------------
+
+class MatchPool:
+
+    # Template matching in worker processes. Jobs are (slot, rect, name)
+    # and results (detected, val, loc, seconds): a few bytes each way.
+    # Workers are spawned (not forked) so they never inherit the app's
+    # threads, and are warmed up in start() so the first frames do not
+    # pay for process startup.
+
+    START_TIMEOUT = 30
+
+    def __init__(self, workers, shape, slots, templates, pyramids, threshold):
+        self.workers = workers
+        self.ring = FrameRing(shape, slots)
+
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(self.ring.name, self.ring.shape, slots, templates, pyramids, threshold)
+        )
+
+        self.frames = 0
+        self.jobs = 0
+        self.fallbacks = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        # Workers start on demand and a spawn takes a while; keep handing
+        # out pings until every one of them has answered
+        pids = set()
+        deadline = time.monotonic() + self.START_TIMEOUT
+
+        while len(pids) < self.workers and time.monotonic() < deadline:
+            futures = [self.executor.submit(ping, 0.05) for _ in range(self.workers)]
+            pids.update(future.result() for future in futures)
+
+        print(f"[POOL] {len(pids)} match worker process(es) ready")
+
+    def acquire(self, gray):
+        slot = self.ring.acquire(gray)
+
+        with self.lock:
+            if slot is None:
+                self.fallbacks += 1
+            else:
+                self.frames += 1
+
+        return slot
+
+    def release(self, slot):
+        self.ring.release(slot)
+
+    def submit(self, slot, rect, name):
+        with self.lock:
+            self.jobs += 1
+
+        return self.executor.submit(match_job, slot, rect, name)
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.ring.close()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "frames": self.frames,
+                "jobs": self.jobs,
+                "fallbacks": self.fallbacks,
+            }
+
+
+# -----------------------------
+# BENCHMARK
+# -----------------------------
+#
+# python match_pool.py <recording> [frames]
+#
+# Frames/s of MatchDetector.match_frame on replayed frames, in-process
+# and with 1..N worker processes. Every frame is a full scan of every
+# template (tracked locations are forgotten first), the load that
+# saturates the detector thread after a phase change.
+
+def benchmark(recording, limit=60):
+    from capture import ReplayFrameSource
+    from detector import MatchDetector
+
+    source = ReplayFrameSource(recording)
+    frames = []
+
+    with source:
+        while len(frames) < limit:
+            frame = source.grab()
+            if frame is None:
+                break
+            frames.append(frame)
+
+    detector = MatchDetector(None, lambda: False, frame_source=source)
+    cores = os.cpu_count() or 1
+    counts = [0] + sorted({1, 2, 4, cores} | ({cores // 2} if cores >= 8 else set()))
+
+    print(f"{len(frames)} replayed frames, {cores} core(s)")
+    print(f"{'workers':>7} {'frames/s':>9} {'speedup':>8} {'max |diff|':>11}")
+
+    baseline = None
+    reference = None
+
+    for count in counts:
+        detector.PROCESS_WORKERS = count
+        # Enough match threads to keep every worker busy
+        threads = max(1, count)
+        detector.MATCH_WORKERS = threads
+        detector.open_match_pool()
+
+        results = [None] * len(frames)
+        next_index = [0]
+        index_lock = threading.Lock()
+
+        def run():
+            while True:
+                with index_lock:
+                    i = next_index[0]
+                    next_index[0] += 1
+
+                if i >= len(frames):
+                    return
+
+                frame = frames[i]
+                frame.matches = {}
+                detector.tracker.forget()
+                detector.match_frame(frame)
+                results[i] = frame.matches
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=run) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        rate = len(frames) / (time.perf_counter() - started)
+
+        detector.close_match_pool()
+
+        if baseline is None:
+            baseline, reference = rate, results
+
+        diff = max(
+            (abs(result[name][1] - expected[name][1])
+             for result, expected in zip(results, reference)
+             for name in expected),
+            default=0.0
+        )
+
+        print(f"{count or 'in-proc':>7} {rate:>9.1f} {rate / baseline:>7.2f}x {diff:>11.2e}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python match_pool.py <recording> [frames]")
+        sys.exit(1)
+
+    benchmark(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 60)
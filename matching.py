@@ -0,0 +1,431 @@
+# matching.py
+
+import threading
+
+import cv2
+import numpy as np
+
+
+def best_match(screen_img, template_img):
+    result = cv2.matchTemplate(screen_img, template_img, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    return max_val, max_loc
+
+
+def fits(template_img, screen_img):
+    return (
+        template_img.shape[0] <= screen_img.shape[0]
+        and template_img.shape[1] <= screen_img.shape[1]
+    )
+
+
+class TemplatePyramid:
+
+    # Multi-scale template built once at init. Every scale is also kept
+    # downsampled by COARSE_FACTOR so a tick can first match all scales
+    # against a downsampled screen, then refine only the best candidate
+    # at full resolution.
+    #
+    # Decision safety: a refined score is an exact full-resolution
+    # TM_CCOEFF_NORMED value, so a hit is always a hit of the exhaustive
+    # search too. A miss is only reported without an exhaustive pass when
+    # every coarse score is below threshold - FALLBACK_MARGIN.
+    #
+    # REFINE_MARGIN is in 1080p pixels and scales with the screen height
+    # (screen_scale), never below the coarse grid's rounding error.
+
+    COARSE_FACTOR = 0.5
+    REFINE_MARGIN = 6
+    FALLBACK_MARGIN = 0.15
+    MIN_COARSE_SIZE = 8
+
+    def __init__(self, template_img, scales, screen_scale=1.0):
+        self.refine_margin = self.scaled_margin(screen_scale)
+        self.levels = []
+
+        for scale in scales:
+            full = cv2.resize(template_img, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+            coarse = cv2.resize(
+                full, None,
+                fx=self.COARSE_FACTOR, fy=self.COARSE_FACTOR,
+                interpolation=cv2.INTER_AREA
+            )
+
+            if min(coarse.shape) < self.MIN_COARSE_SIZE:
+                coarse = None
+
+            self.levels.append((float(scale), full, coarse))
+
+    @classmethod
+    def from_levels(cls, levels, screen_scale=1.0):
+        # Rebuild from prepared (scale, full, coarse) levels, e.g. loaded
+        # from the template cache
+        pyramid = cls.__new__(cls)
+        pyramid.refine_margin = cls.scaled_margin(screen_scale)
+        pyramid.levels = list(levels)
+        return pyramid
+
+    @classmethod
+    def scaled_margin(cls, screen_scale):
+        return max(int(np.ceil(1 / cls.COARSE_FACTOR)), int(round(cls.REFINE_MARGIN * screen_scale)))
+
+    def refine(self, screen_img, template_img, loc):
+        th, tw = template_img.shape
+        sh, sw = screen_img.shape
+        m = self.refine_margin
+
+        x1 = max(0, loc[0] - m)
+        y1 = max(0, loc[1] - m)
+        x2 = min(sw, loc[0] + tw + m)
+        y2 = min(sh, loc[1] + th + m)
+
+        window = screen_img[y1:y2, x1:x2]
+        if not fits(template_img, window):
+            return best_match(screen_img, template_img)
+
+        val, (wx, wy) = best_match(window, template_img)
+        return val, (wx + x1, wy + y1)
+
+    def match(self, screen_img, threshold):
+        coarse_screen = cv2.resize(
+            screen_img, None,
+            fx=self.COARSE_FACTOR, fy=self.COARSE_FACTOR,
+            interpolation=cv2.INTER_AREA
+        )
+
+        candidates = []
+
+        for scale, full, coarse in self.levels:
+            if not fits(full, screen_img):
+                continue
+
+            if coarse is None or not fits(coarse, coarse_screen):
+                val, loc = best_match(screen_img, full)
+                if val >= threshold:
+                    return True, val, loc
+                candidates.append((val, full, loc, True))
+                continue
+
+            val, (cx, cy) = best_match(coarse_screen, coarse)
+            loc = (int(round(cx / self.COARSE_FACTOR)), int(round(cy / self.COARSE_FACTOR)))
+            candidates.append((val, full, loc, False))
+
+        if not candidates:
+            return False, 0, (0, 0)
+
+        candidates.sort(key=lambda c: c[0], reverse=True)
+
+        best_conf = 0
+        best_loc = (0, 0)
+
+        for val, full, loc, exact in candidates:
+            if exact and val > best_conf:
+                best_conf, best_loc = val, loc
+
+        coarse_val, full, loc, exact = candidates[0]
+        if not exact:
+            val, loc = self.refine(screen_img, full, loc)
+            if val >= threshold:
+                return True, val, loc
+            if val > best_conf:
+                best_conf, best_loc = val, loc
+
+        # Ambiguous: fall back to an exhaustive full-resolution search on
+        # every scale whose coarse score came close to the threshold.
+        for coarse_val, full, loc, exact in candidates:
+            if exact or coarse_val < threshold - self.FALLBACK_MARGIN:
+                continue
+
+            val, found = best_match(screen_img, full)
+            if val > best_conf:
+                best_conf, best_loc = val, found
+
+        return best_conf >= threshold, best_conf, best_loc
+
+
+class SpectralBank:
+
+    # Batched TM_CCOEFF_NORMED for every template that searches the same
+    # region. The region is transformed once per tick; each template's
+    # (zero-mean) spectrum is prepared up front, so all numerators come
+    # out of one vectorized multiply + inverse FFT. Window means and
+    # energies come from integral images, one per template size.
+    #
+    # With a zero-mean template T' the TM_CCOEFF_NORMED score is
+    #
+    #   sum(I * T') / (|T'| * sqrt(sum(I^2) - sum(I)^2 / n))
+    #
+    # over each window of the region. The FFT size is at least the region
+    # size, so valid positions never see wrapped-around pixels.
+    #
+    # Not wired into the detector: `python matching.py` only shows it
+    # beating per-template matchTemplate from about 16 templates in one
+    # region, and no region holds more than 4 single-scale templates.
+
+    # Windows flatter than this (in gray levels) score 0, like a template
+    # over a blank area
+    MIN_STD = 1e-3
+
+    def __init__(self, templates, region_shape):
+        self.region_shape = tuple(region_shape)
+        h, w = self.region_shape
+
+        self.fft_shape = (cv2.getOptimalDFTSize(h), cv2.getOptimalDFTSize(w))
+
+        self.names = []
+        self.shapes = []
+        self.norms = []
+        spectra = []
+
+        for name, template_img in templates.items():
+            if not fits(template_img, np.empty(self.region_shape)):
+                continue
+
+            centered = template_img.astype(np.float32) - float(template_img.mean())
+
+            self.names.append(name)
+            self.shapes.append(centered.shape)
+            self.norms.append(float(np.sqrt((centered.astype(np.float64) ** 2).sum())))
+
+            # Correlation = convolution with the flipped kernel, i.e. the
+            # conjugate spectrum of the template
+            spectra.append(np.conj(np.fft.rfft2(centered, s=self.fft_shape)))
+
+        self.spectra = np.stack(spectra) if spectra else None
+
+    def __len__(self):
+        return len(self.names)
+
+    def inverse_deviation(self, integral, integral_sq, shape):
+        # 1 / window standard deviation * sqrt(n), 0 for flat windows
+        th, tw = shape
+        n = th * tw
+
+        s1 = integral[th:, tw:] - integral[:-th, tw:] - integral[th:, :-tw] + integral[:-th, :-tw]
+        s2 = integral_sq[th:, tw:] - integral_sq[:-th, tw:] - integral_sq[th:, :-tw] + integral_sq[:-th, :-tw]
+
+        deviation = np.sqrt(np.maximum(s2 - s1 * s1 / n, 0)).astype(np.float32)
+
+        inverse = np.zeros(deviation.shape, dtype=np.float32)
+        np.divide(1.0, deviation, out=inverse, where=deviation > self.MIN_STD * np.sqrt(n))
+        return inverse
+
+    def match(self, screen_img, names=None):
+        # -> {name: (max_val, max_loc)} for names (default: every template)
+        if self.spectra is None:
+            return {}
+
+        if names is None:
+            indices = list(range(len(self.names)))
+        else:
+            indices = [i for i, name in enumerate(self.names) if name in names]
+
+        if screen_img.shape != self.region_shape:
+            raise ValueError(f"SpectralBank built for {self.region_shape}, got {screen_img.shape}")
+
+        h, w = self.region_shape
+
+        numerators = np.fft.irfft2(
+            np.fft.rfft2(screen_img.astype(np.float32), s=self.fft_shape)[None] * self.spectra[indices],
+            s=self.fft_shape
+        )
+
+        integral, integral_sq = cv2.integral2(screen_img, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+
+        inverses = {}
+        results = {}
+
+        for row, i in enumerate(indices):
+            name = self.names[i]
+            shape = self.shapes[i]
+            th, tw = shape
+
+            if shape not in inverses:
+                inverses[shape] = self.inverse_deviation(integral, integral_sq, shape)
+
+            # |T'| is a per-template constant, so the argmax can be taken
+            # before dividing by it
+            scores = numerators[row, :h - th + 1, :w - tw + 1] * inverses[shape]
+
+            y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+            val = float(scores[y, x]) / self.norms[i] if self.norms[i] else 0.0
+
+            results[name] = (min(1.0, max(-1.0, val)), (int(x), int(y)))
+
+        return results
+
+
+class LocationTracker:
+
+    # Remembers where each template last matched and searches a small
+    # window around that spot first. TM_CCOEFF_NORMED scores only depend
+    # on the pixels under the template, so a hit inside the window is a
+    # hit of the full-region search as well; only a miss pays for the
+    # full region.
+    #
+    # MARGIN is in 1080p pixels; scale (screen height / BASE_HEIGHT)
+    # converts it for the current screen, like the templates themselves.
+
+    MARGIN = 24
+
+    def __init__(self, margin=MARGIN, scale=1.0):
+        self.margin = max(1, int(round(margin * scale)))
+        self.locations = {}
+        self.hits = {}
+        self.misses = {}
+        self.full_scans = {}
+        self.lock = threading.Lock()
+
+    def count(self, counter, name):
+        with self.lock:
+            counter[name] = counter.get(name, 0) + 1
+
+    def forget(self, name=None):
+        if name is None:
+            self.locations.clear()
+        else:
+            self.locations.pop(name, None)
+
+    def window(self, screen_img, loc, footprint):
+        th, tw = footprint
+        sh, sw = screen_img.shape[:2]
+        m = self.margin
+
+        x1 = max(0, loc[0] - m)
+        y1 = max(0, loc[1] - m)
+        x2 = min(sw, loc[0] + tw + m)
+        y2 = min(sh, loc[1] + th + m)
+
+        if y2 - y1 < th or x2 - x1 < tw:
+            return None, (0, 0)
+
+        return screen_img[y1:y2, x1:x2], (x1, y1)
+
+    def window_for(self, name, screen_img, footprint):
+        # -> (window, origin) around the last hit, or None when the full
+        # region has to be scanned
+        last = self.locations.get(name)
+
+        if last is None:
+            return None
+
+        window, origin = self.window(screen_img, last, footprint)
+
+        if window is None:
+            self.count(self.misses, name)
+            return None
+
+        return window, origin
+
+    def record_window(self, name, result, origin):
+        # Result of a window search, however it was computed. -> the hit
+        # in region coordinates, or None (scan the full region)
+        detected, val, (wx, wy) = result
+
+        if not detected:
+            self.count(self.misses, name)
+            return None
+
+        self.count(self.hits, name)
+        loc = (wx + origin[0], wy + origin[1])
+        self.locations[name] = loc
+        return detected, val, loc
+
+    def search_window(self, name, screen_img, footprint, match_fn):
+        # -> the hit near the last location, or None when the full region
+        # has to be scanned
+        found = self.window_for(name, screen_img, footprint)
+
+        if found is None:
+            return None
+
+        window, origin = found
+        return self.record_window(name, match_fn(window), origin)
+
+    def record_full(self, name, result):
+        # Result of a full-region scan, however it was computed
+        self.count(self.full_scans, name)
+
+        if result[0]:
+            self.locations[name] = result[2]
+
+        return result
+
+    def search(self, name, screen_img, footprint, match_fn):
+        result = self.search_window(name, screen_img, footprint, match_fn)
+
+        if result is not None:
+            return result
+
+        return self.record_full(name, match_fn(screen_img))
+
+    def stats(self):
+        with self.lock:
+            return self.collect_stats()
+
+    def collect_stats(self):
+        hits = sum(self.hits.values())
+        misses = sum(self.misses.values())
+        tried = hits + misses
+
+        return {
+            "hits": hits,
+            "misses": misses,
+            "full_scans": sum(self.full_scans.values()),
+            "hit_rate": hits / tried if tried else 0.0,
+            "per_template": {
+                name: {
+                    "hits": self.hits.get(name, 0),
+                    "misses": self.misses.get(name, 0),
+                    "full_scans": self.full_scans.get(name, 0),
+                }
+                for name in set(self.hits) | set(self.misses) | set(self.full_scans)
+            },
+        }
+
+
+# -----------------------------
+# BENCHMARK
+# -----------------------------
+
+def benchmark(counts=(1, 2, 4, 8, 16), region_shape=(540, 960), repeat=10):
+    # Per-template cv2.matchTemplate vs one SpectralBank pass on a
+    # synthetic top_right-sized region, with templates sized like the
+    # ones in assets/.
+    import time
+
+    rng = np.random.default_rng(0)
+    region = cv2.GaussianBlur(rng.integers(0, 256, region_shape, dtype=np.uint8), (5, 5), 0)
+    sizes = [(76, 85), (98, 342), (31, 210), (17, 64)]
+
+    def timed(fn):
+        fn()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    print(f"region {region_shape[1]}x{region_shape[0]}, {repeat} runs each")
+    print(f"{'templates':>9} {'per-template ms':>16} {'batched ms':>11} {'max |diff|':>11}")
+
+    for count in counts:
+        templates = {}
+        for i in range(count):
+            th, tw = sizes[i % len(sizes)]
+            y = int(rng.integers(0, region_shape[0] - th))
+            x = int(rng.integers(0, region_shape[1] - tw))
+            templates[f"t{i}"] = region[y:y + th, x:x + tw].copy()
+
+        bank = SpectralBank(templates, region_shape)
+
+        batched = bank.match(region)
+        diff = max(abs(batched[name][0] - best_match(region, img)[0]) for name, img in templates.items())
+
+        per_ms = timed(lambda: [best_match(region, img) for img in templates.values()])
+        bank_ms = timed(lambda: bank.match(region))
+
+        print(f"{count:>9} {per_ms:>16.1f} {bank_ms:>11.1f} {diff:>11.2e}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,303 @@
+# metrics.py
+
+import bisect
+import csv
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+
+from outbox import DATA_DIR
+
+
+METRICS_JSONL_PATH = os.path.join(DATA_DIR, "metrics.jsonl")
+METRICS_CSV_PATH = os.path.join(DATA_DIR, "metrics.csv")
+
+
+# -----------------------------
+# HISTOGRAM
+# -----------------------------
+
+# Bucket upper bounds in seconds: 10 us .. ~40 s, each 25% above the last
+BUCKETS = [1e-5 * 1.25 ** i for i in range(math.ceil(math.log(4e6, 1.25)))]
+
+
+class Histogram:
+
+    # Fixed log-spaced buckets: observe() is a bisect and a few adds, and
+    # memory does not grow with the number of samples. Percentiles are
+    # the upper bound of the bucket the rank falls in (within 25%).
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(BUCKETS, seconds)
+
+        with self.lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, q, counts, count):
+        rank = q * count
+        seen = 0
+
+        for i, n in enumerate(counts):
+            seen += n
+            if seen >= rank and n:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+
+        return self.max
+
+    def stats(self):
+        with self.lock:
+            counts = list(self.counts)
+            count, total, longest = self.count, self.total, self.max
+
+        if not count:
+            return {"count": 0}
+
+        return {
+            "count": count,
+            "mean_ms": total / count * 1000,
+            "p50_ms": min(self.percentile(0.50, counts, count), longest) * 1000,
+            "p95_ms": min(self.percentile(0.95, counts, count), longest) * 1000,
+            "p99_ms": min(self.percentile(0.99, counts, count), longest) * 1000,
+            "max_ms": longest * 1000,
+        }
+
+
+class Timer:
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+# -----------------------------
+# REGISTRY
+# -----------------------------
+
+class Metrics:
+
+    # Process-wide timing histograms and counters for the hot paths
+    # (capture, matching, OCR, state update, sheet writes). Cheap enough
+    # to stay on: a sample costs a few us and nothing is aggregated until
+    # snapshot(). The detailed stats components already keep (glyph bank,
+    # tracker, scheduler, ...) are pulled in through add_source() at
+    # snapshot time.
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.sources = {}
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+
+        return histogram
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+
+    def time(self, name):
+        # with metrics.time("ocr.currency"): ...
+        return Timer(self.histogram(name))
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_source(self, name, stats):
+        # stats() -> dict, read on every snapshot
+        with self.lock:
+            self.sources[name] = stats
+
+    def snapshot(self):
+        with self.lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+            sources = dict(self.sources)
+
+        result = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "timings": {name: histogram.stats() for name, histogram in sorted(histograms.items())},
+            "counters": dict(sorted(counters.items())),
+            "sources": {},
+        }
+
+        for name, stats in sources.items():
+            try:
+                result["sources"][name] = stats()
+            except Exception as e:
+                result["sources"][name] = {"error": str(e)}
+
+        return result
+
+
+metrics = Metrics()
+
+
+# -----------------------------
+# PERIODIC DUMP
+# -----------------------------
+
+def flatten(data, prefix=""):
+    # {"a": {"b": 1}} -> [("a.b", 1)], numbers only
+    rows = []
+
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+
+        if isinstance(value, dict):
+            rows.extend(flatten(value, name))
+        elif isinstance(value, (bool, int, float)):
+            rows.append((name, value))
+
+    return rows
+
+
+class MetricsDumper:
+
+    # Appends a snapshot every INTERVAL seconds: one JSON object per line
+    # to metrics.jsonl and one (timestamp, metric, value) row per number
+    # to metrics.csv. Runs on its own thread; a final dump on stop().
+
+    INTERVAL = 60.0
+
+    def __init__(self, registry=metrics, interval=INTERVAL,
+                 jsonl_path=METRICS_JSONL_PATH, csv_path=METRICS_CSV_PATH):
+        self.registry = registry
+        self.interval = interval
+        self.jsonl_path = jsonl_path
+        self.csv_path = csv_path
+
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="metrics-dump", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2):
+        self.stop_event.set()
+
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.dump()
+
+        self.dump()
+
+    def dump(self):
+        snapshot = self.registry.snapshot()
+
+        try:
+            if self.jsonl_path:
+                os.makedirs(os.path.dirname(self.jsonl_path), exist_ok=True)
+
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(snapshot) + "\n")
+
+            if self.csv_path:
+                os.makedirs(os.path.dirname(self.csv_path), exist_ok=True)
+                new_file = not os.path.exists(self.csv_path)
+
+                with open(self.csv_path, "a", encoding="utf-8", newline="") as f:
+                    writer = csv.writer(f)
+                    if new_file:
+                        writer.writerow(["timestamp", "metric", "value"])
+
+                    for name, value in flatten(snapshot):
+                        writer.writerow([snapshot["timestamp"], name, value])
+
+        except OSError as e:
+            print("[WARN] Could not write metrics:", e)
+
+
+# -----------------------------
+# DEBUG PANEL TEXT
+# -----------------------------
+
+def format_snapshot(snapshot, limit=14):
+    # Slowest timings first (p95), then the counters
+    timings = sorted(
+        ((name, stats) for name, stats in snapshot["timings"].items() if stats["count"]),
+        key=lambda item: -item[1]["p95_ms"]
+    )
+
+    lines = []
+
+    lifecycle = snapshot["sources"].get("lifecycle")
+    if lifecycle and "phase" in lifecycle:
+        lines.append(f"phase {lifecycle['phase']} for {lifecycle['seconds_in_phase']:.0f}s")
+        lines.append("")
+
+    lines.append(f"{'timing':<24}{'n':>7}{'p50':>8}{'p95':>8}{'max':>8}  ms")
+
+    for name, stats in timings[:limit]:
+        lines.append(
+            f"{name[:23]:<24}{stats['count']:>7}"
+            f"{stats['p50_ms']:>8.1f}{stats['p95_ms']:>8.1f}{stats['max_ms']:>8.1f}"
+        )
+
+    if snapshot["counters"]:
+        lines.append("")
+        lines.extend(f"{name[:31]:<32}{value:>8}" for name, value in snapshot["counters"].items())
+
+    return "\n".join(lines)
+
+
+# -----------------------------
+# OVERHEAD CHECK
+# -----------------------------
+
+if __name__ == "__main__":
+    registry = Metrics()
+    samples = 200_000
+
+    started = time.perf_counter()
+    for i in range(samples):
+        registry.observe("bench.observe", 0.001)
+    observe = (time.perf_counter() - started) / samples
+
+    started = time.perf_counter()
+    for i in range(samples):
+        with registry.time("bench.timer"):
+            pass
+    timer = (time.perf_counter() - started) / samples
+
+    started = time.perf_counter()
+    for i in range(samples):
+        registry.count("bench.count")
+    count = (time.perf_counter() - started) / samples
+
+    print(f"observe(): {observe * 1e6:.2f} us")
+    print(f"with time(): {timer * 1e6:.2f} us")
+    print(f"count(): {count * 1e6:.2f} us")
+    print()
+    print(format_snapshot(registry.snapshot()))
@@ -0,0 +1,724 @@
+# ocr.py
+
+import ctypes
+import ctypes.util
+import glob
+import hashlib
+import multiprocessing
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+import pytesseract
+
+from metrics import metrics
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+
+# -----------------------------
+# OCR PROFILES
+# -----------------------------
+
+class OcrProfile:
+
+    def __init__(self, psm=None, whitelist=None):
+        self.psm = psm
+        self.whitelist = whitelist
+
+    def config(self):
+        parts = []
+        if self.psm is not None:
+            parts.append(f"--psm {self.psm}")
+        if self.whitelist:
+            parts.append(f"-c tessedit_char_whitelist={self.whitelist}")
+        return " ".join(parts)
+
+
+OCR_PROFILES = {
+    # Currency counter: single text line, digits and separators only
+    "currency": OcrProfile(psm=7, whitelist="0123456789,"),
+    # Full-page read, fallback for the FINDINGS / RAIDER keyword checks
+    "page": OcrProfile(),
+    # Single upper-case word / line inside a keyword ROI
+    "keyword": OcrProfile(psm=7, whitelist="ABCDEFGHIJKLMNOPQRSTUVWXYZ"),
+}
+
+
+# -----------------------------
+# OCR ENGINES
+# -----------------------------
+
+class PytesseractEngine:
+
+    # One tesseract process per read() call. Last resort when neither
+    # tesserocr nor libtesseract can be loaded.
+
+    name = "pytesseract"
+
+    def __init__(self, profiles=None):
+        self.profiles = profiles or OCR_PROFILES
+
+    def read(self, img, profile):
+        with metrics.time(f"ocr.{profile}"):
+            return pytesseract.image_to_string(img, config=self.profiles[profile].config())
+
+    def read_words(self, img, profile):
+        # -> [(text, (x, y, w, h)), ...]
+        with metrics.time(f"ocr.{profile}.words"):
+            data = pytesseract.image_to_data(
+                img,
+                config=self.profiles[profile].config(),
+                output_type=pytesseract.Output.DICT
+            )
+
+        return [
+            (text, (data["left"][i], data["top"][i], data["width"][i], data["height"][i]))
+            for i, text in enumerate(data["text"])
+            if text.strip()
+        ]
+
+    def read_batch(self, items):
+        # [(img, profile), ...] -> [text, ...]
+        return [self.read(img, profile) for img, profile in items]
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine:
+
+    # Long-lived in-process Tesseract API handles, one per profile, so a
+    # read is a SetImageBytes + GetUTF8Text instead of a process spawn and
+    # PNG round trip. Each handle is guarded by its own lock.
+
+    name = "tesserocr"
+
+    def __init__(self, profiles=None):
+        self.profiles = profiles or OCR_PROFILES
+        self.apis = {}
+        self.locks = {}
+        self.create_lock = threading.Lock()
+
+    def api(self, profile):
+        with self.create_lock:
+            if profile not in self.apis:
+                settings = self.profiles[profile]
+                psm = tesserocr.PSM.AUTO if settings.psm is None else settings.psm
+
+                api = tesserocr.PyTessBaseAPI(psm=psm)
+                if settings.whitelist:
+                    api.SetVariable("tessedit_char_whitelist", settings.whitelist)
+
+                self.apis[profile] = api
+                self.locks[profile] = threading.Lock()
+
+            return self.apis[profile], self.locks[profile]
+
+    def set_image(self, api, img):
+        img = np.ascontiguousarray(img)
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        h, w = img.shape
+        api.SetImageBytes(img.tobytes(), w, h, 1, w)
+
+    def read(self, img, profile):
+        api, lock = self.api(profile)
+
+        with lock, metrics.time(f"ocr.{profile}"):
+            self.set_image(api, img)
+            return api.GetUTF8Text()
+
+    def read_words(self, img, profile):
+        api, lock = self.api(profile)
+        words = []
+
+        with lock, metrics.time(f"ocr.{profile}.words"):
+            self.set_image(api, img)
+            api.Recognize()
+
+            level = tesserocr.RIL.WORD
+            for result in tesserocr.iterate_level(api.GetIterator(), level):
+                text = result.GetUTF8Text(level)
+                box = result.BoundingBox(level)
+
+                if text and text.strip() and box:
+                    x1, y1, x2, y2 = box
+                    words.append((text, (x1, y1, x2 - x1, y2 - y1)))
+
+        return words
+
+    def read_batch(self, items):
+        # In-process reads have no round trip to amortise
+        return [self.read(img, profile) for img, profile in items]
+
+    def close(self):
+        with self.create_lock:
+            for api in self.apis.values():
+                api.End()
+            self.apis.clear()
+            self.locks.clear()
+
+
+# -----------------------------
+# TESSERACT WORKER PROCESS
+# -----------------------------
+
+# libtesseract file names, looked up next to the tesseract binary first
+TESSERACT_LIBRARIES = ("libtesseract-*.dll", "tesseract*.dll", "libtesseract.so*", "libtesseract*.dylib")
+
+# capi.h constants
+PSM_AUTO = 3
+RIL_WORD = 3
+
+
+def find_tesseract_library():
+    # -> path of libtesseract, or None. The Windows installer puts the DLL
+    # (and leptonica) next to tesseract.exe, which pytesseract already
+    # needs on PATH or in tesseract_cmd.
+    cmd = shutil.which(pytesseract.pytesseract.tesseract_cmd)
+
+    if cmd:
+        directory = os.path.dirname(os.path.realpath(cmd))
+
+        for pattern in TESSERACT_LIBRARIES:
+            found = sorted(glob.glob(os.path.join(directory, pattern)))
+            if found:
+                return found[-1]
+
+    return ctypes.util.find_library("tesseract")
+
+
+class TesseractApi:
+
+    # ctypes binding of the few libtesseract C API calls the engines need.
+    # One handle per profile, each initialised once with its PSM and
+    # whitelist, like the tesserocr handles.
+
+    def __init__(self, library, profiles):
+        directory = os.path.dirname(library)
+        if directory and hasattr(os, "add_dll_directory"):
+            os.add_dll_directory(directory)
+
+        self.lib = lib = ctypes.CDLL(library)
+        handle = ctypes.c_void_p
+        text = ctypes.c_char_p
+        i = ctypes.c_int
+
+        for name, restype, argtypes in [
+            ("TessBaseAPICreate", handle, []),
+            ("TessBaseAPIInit3", i, [handle, text, text]),
+            ("TessBaseAPISetPageSegMode", None, [handle, i]),
+            ("TessBaseAPISetVariable", i, [handle, text, text]),
+            ("TessBaseAPISetImage", None, [handle, ctypes.c_void_p, i, i, i, i]),
+            ("TessBaseAPIGetUTF8Text", handle, [handle]),
+            ("TessBaseAPIRecognize", i, [handle, handle]),
+            ("TessBaseAPIGetIterator", handle, [handle]),
+            ("TessResultIteratorGetPageIterator", handle, [handle]),
+            ("TessResultIteratorGetUTF8Text", handle, [handle, i]),
+            ("TessResultIteratorNext", i, [handle, i]),
+            ("TessResultIteratorDelete", None, [handle]),
+            ("TessPageIteratorBoundingBox", i, [handle, i] + [ctypes.POINTER(i)] * 4),
+            ("TessDeleteText", None, [handle]),
+            ("TessBaseAPIEnd", None, [handle]),
+            ("TessBaseAPIDelete", None, [handle]),
+        ]:
+            function = getattr(lib, name)
+            function.restype = restype
+            function.argtypes = argtypes
+
+        datapath = os.environ.get("TESSDATA_PREFIX")
+        if datapath is None and directory and os.path.isdir(os.path.join(directory, "tessdata")):
+            datapath = os.path.join(directory, "tessdata")
+
+        self.handles = {}
+
+        for profile, settings in profiles.items():
+            api = lib.TessBaseAPICreate()
+
+            if lib.TessBaseAPIInit3(api, datapath.encode() if datapath else None, b"eng") != 0:
+                lib.TessBaseAPIDelete(api)
+                self.close()
+                raise RuntimeError(f"TessBaseAPIInit3 failed (tessdata: {datapath or 'default'})")
+
+            lib.TessBaseAPISetPageSegMode(api, PSM_AUTO if settings.psm is None else settings.psm)
+            if settings.whitelist:
+                lib.TessBaseAPISetVariable(api, b"tessedit_char_whitelist", settings.whitelist.encode())
+
+            self.handles[profile] = api
+
+    def take_text(self, pointer):
+        if not pointer:
+            return ""
+
+        try:
+            return ctypes.string_at(pointer).decode("utf-8", "replace")
+        finally:
+            self.lib.TessDeleteText(pointer)
+
+    def set_image(self, api, data, w, h):
+        self.lib.TessBaseAPISetImage(api, data, w, h, 1, w)
+
+    def read(self, profile, data, w, h):
+        api = self.handles[profile]
+        self.set_image(api, data, w, h)
+        return self.take_text(self.lib.TessBaseAPIGetUTF8Text(api))
+
+    def read_words(self, profile, data, w, h):
+        lib = self.lib
+        api = self.handles[profile]
+        self.set_image(api, data, w, h)
+
+        if lib.TessBaseAPIRecognize(api, None) != 0:
+            return []
+
+        iterator = lib.TessBaseAPIGetIterator(api)
+        if not iterator:
+            return []
+
+        words = []
+        box = [ctypes.c_int() for _ in range(4)]
+
+        try:
+            page = lib.TessResultIteratorGetPageIterator(iterator)
+
+            while True:
+                text = self.take_text(lib.TessResultIteratorGetUTF8Text(iterator, RIL_WORD))
+
+                if text.strip() and lib.TessPageIteratorBoundingBox(page, RIL_WORD, *[ctypes.byref(v) for v in box]):
+                    x1, y1, x2, y2 = (v.value for v in box)
+                    words.append((text, (x1, y1, x2 - x1, y2 - y1)))
+
+                if not lib.TessResultIteratorNext(iterator, RIL_WORD):
+                    break
+        finally:
+            lib.TessResultIteratorDelete(iterator)
+
+        return words
+
+    def close(self):
+        for api in self.handles.values():
+            self.lib.TessBaseAPIEnd(api)
+            self.lib.TessBaseAPIDelete(api)
+        self.handles.clear()
+
+
+def tesseract_worker(conn, library, profiles):
+    # Child process, until None arrives:
+    #   ("read" | "words", (profile, w, h, pixels)) -> ("ok", result)
+    #   ("batch", [(profile, w, h, pixels), ...])   -> ("ok", [text, ...])
+    # or ("error", message) when a read raises
+    try:
+        api = TesseractApi(library, profiles)
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+
+    conn.send(("ok", None))
+
+    try:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                break
+
+            if request is None:
+                break
+
+            op, payload = request
+
+            try:
+                if op == "batch":
+                    conn.send(("ok", [api.read(profile, data, w, h) for profile, w, h, data in payload]))
+                elif op == "words":
+                    profile, w, h, data = payload
+                    conn.send(("ok", api.read_words(profile, data, w, h)))
+                else:
+                    profile, w, h, data = payload
+                    conn.send(("ok", api.read(profile, data, w, h)))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        api.close()
+
+
+class TesseractWorkerEngine:
+
+    # Default-install counterpart of TesserocrEngine: one long-lived child
+    # process holds initialised libtesseract handles and is fed crops over
+    # a pipe, so a read is a pipe round trip instead of a tesseract spawn
+    # plus PNG files. The native library stays out of the app process; if
+    # the worker dies or a reply takes longer than READ_TIMEOUT per crop,
+    # the worker is killed and reads fall back to pytesseract.
+
+    name = "tesseract-worker"
+
+    START_TIMEOUT = 15
+    READ_TIMEOUT = 5
+
+    def __init__(self, library, profiles=None):
+        self.profiles = profiles or OCR_PROFILES
+        self.lock = threading.Lock()
+        self.fallback = None
+
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+
+        self.process = context.Process(
+            target=tesseract_worker,
+            args=(child_conn, library, self.profiles),
+            name="tesseract-worker",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+        try:
+            if not self.conn.poll(self.START_TIMEOUT):
+                raise RuntimeError("tesseract worker did not start")
+
+            status, message = self.conn.recv()
+        except (EOFError, OSError, RuntimeError) as e:
+            self.close()
+            raise RuntimeError(f"tesseract worker exited during startup: {e}")
+
+        if status != "ok":
+            self.close()
+            raise RuntimeError(message)
+
+    def pack(self, img, profile):
+        img = np.ascontiguousarray(img)
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        h, w = img.shape
+        return profile, w, h, img.tobytes()
+
+    def request(self, op, payload, crops=1):
+        # -> (True, result) from the worker, or (False, None) once it is
+        # gone and the caller has to use self.fallback
+        with self.lock:
+            if self.fallback is None:
+                try:
+                    self.conn.send((op, payload))
+
+                    if not self.conn.poll(self.READ_TIMEOUT * crops):
+                        raise TimeoutError(f"no reply after {self.READ_TIMEOUT * crops}s")
+
+                    status, result = self.conn.recv()
+                except (EOFError, OSError) as e:
+                    print("[WARN] Tesseract worker lost, falling back to pytesseract:", e)
+                    self.process.kill()
+                    self.fallback = PytesseractEngine(self.profiles)
+                else:
+                    if status != "ok":
+                        raise RuntimeError(result)
+                    return True, result
+
+        return False, None
+
+    def read(self, img, profile):
+        with metrics.time(f"ocr.{profile}"):
+            ok, text = self.request("read", self.pack(img, profile))
+            return text if ok else self.fallback.read(img, profile)
+
+    def read_words(self, img, profile):
+        with metrics.time(f"ocr.{profile}.words"):
+            ok, words = self.request("words", self.pack(img, profile))
+            return words if ok else self.fallback.read_words(img, profile)
+
+    def read_batch(self, items):
+        # [(img, profile), ...] -> [text, ...] in one pipe round trip
+        if not items:
+            return []
+
+        with metrics.time("ocr.batch"):
+            ok, texts = self.request("batch", [self.pack(img, profile) for img, profile in items], len(items))
+            return texts if ok else self.fallback.read_batch(items)
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+
+        self.process.join(2)
+        if self.process.is_alive():
+            self.process.terminate()
+
+        self.conn.close()
+
+
+def create_ocr_engine(profiles=None):
+    # tesserocr when installed, else libtesseract in a worker process,
+    # else one tesseract process per read
+    if tesserocr is not None:
+        try:
+            engine = TesserocrEngine(profiles)
+            engine.api("currency")
+            print("[INIT] OCR engine: tesserocr (in-process)")
+            return engine
+        except Exception as e:
+            print("[WARN] tesserocr unavailable:", e)
+
+    library = find_tesseract_library()
+
+    if library:
+        try:
+            engine = TesseractWorkerEngine(library, profiles)
+            print(f"[INIT] OCR engine: tesseract worker process ({library})")
+            return engine
+        except Exception as e:
+            print("[WARN] Tesseract worker unavailable:", e)
+
+    print("[INIT] OCR engine: pytesseract")
+    return PytesseractEngine(profiles)
+
+
+# -----------------------------
+# KEYWORD VERIFIER
+# -----------------------------
+
+class KeywordVerifier:
+
+    # Checks whether a keyword (FINDINGS, RAIDER) is on screen without a
+    # full-page OCR per check. The first full-page hit records where the
+    # word sits relative to an anchor template and keeps its pixels.
+    # After that, a check is:
+    #
+    #   1. match the remembered word pixels inside a small ROI (~ms)
+    #   2. single-line "keyword" OCR on the same ROI
+    #   3. full-page OCR only when nothing is learned yet, there is no
+    #      anchor, or the ROI missed FALLBACK_AFTER times in a row (relearn)
+
+    MATCH_THRESHOLD = 0.85
+    PADDING = 12
+    FALLBACK_AFTER = 5
+
+    def __init__(self, ocr, keyword, scale=1.0):
+        self.ocr = ocr
+        self.keyword = keyword.upper()
+        self.padding = int(self.PADDING * scale)
+
+        self.offset = None
+        self.word_image = None
+        self.roi_misses = 0
+
+        self.counts = {"template": 0, "line_ocr": 0, "page_ocr": 0, "negative": 0}
+        self.lock = threading.Lock()
+
+    def count(self, kind):
+        with self.lock:
+            self.counts[kind] += 1
+
+    def roi(self, region_img, anchor_loc):
+        dx, dy, w, h = self.offset
+        p = self.padding
+
+        x1 = max(0, anchor_loc[0] + dx - p)
+        y1 = max(0, anchor_loc[1] + dy - p)
+        x2 = min(region_img.shape[1], anchor_loc[0] + dx + w + p)
+        y2 = min(region_img.shape[0], anchor_loc[1] + dy + h + p)
+
+        if x2 <= x1 or y2 <= y1:
+            return None
+
+        return region_img[y1:y2, x1:x2]
+
+    def word_matches(self, roi):
+        word = self.word_image
+
+        if word is None or word.shape[0] > roi.shape[0] or word.shape[1] > roi.shape[1]:
+            return False
+
+        result = cv2.matchTemplate(roi, word, cv2.TM_CCOEFF_NORMED)
+        return cv2.minMaxLoc(result)[1] >= self.MATCH_THRESHOLD
+
+    def check_roi(self, roi, line_text=None):
+        if line_text is None:
+            if self.word_matches(roi):
+                self.count("template")
+                return True
+
+            line_text = self.ocr.read(roi, "keyword")
+
+        if self.keyword in line_text.upper():
+            self.count("line_ocr")
+            return True
+
+        return False
+
+    def line_roi(self, region_img, anchor_loc):
+        # -> the ROI verify() would hand to the single-line OCR, or None
+        # when it needs no such read. Lets the caller batch that read with
+        # its other crops and pass the text back as verify(line_text=...).
+        if anchor_loc is None or self.offset is None:
+            return None
+
+        roi = self.roi(region_img, anchor_loc)
+
+        if roi is None or self.word_matches(roi):
+            return None
+
+        return roi
+
+    def learn(self, region_img, anchor_loc, box):
+        x, y, w, h = box
+
+        with self.lock:
+            self.offset = (x - anchor_loc[0], y - anchor_loc[1], w, h)
+            self.word_image = region_img[y:y + h, x:x + w].copy()
+            self.roi_misses = 0
+
+    def verify(self, region_img, anchor_loc=None, line_text=None):
+        if anchor_loc is not None and self.offset is not None:
+            roi = self.roi(region_img, anchor_loc)
+
+            if roi is not None:
+                if self.check_roi(roi, line_text):
+                    self.roi_misses = 0
+                    return True
+
+                self.roi_misses += 1
+                if self.roi_misses < self.FALLBACK_AFTER:
+                    self.count("negative")
+                    return False
+
+        self.roi_misses = 0
+        self.count("page_ocr")
+
+        for text, box in self.ocr.read_words(region_img, "page"):
+            if self.keyword in text.upper():
+                if anchor_loc is not None:
+                    self.learn(region_img, anchor_loc, box)
+                return True
+
+        return False
+
+    def stats(self):
+        with self.lock:
+            return {
+                "keyword": self.keyword,
+                "learned": self.offset is not None,
+                **self.counts,
+            }
+
+
+# -----------------------------
+# OCR RESULT CACHE
+# -----------------------------
+
+
+class OcrCache:
+
+    # Bounded LRU cache for OCR results, keyed by a hash of the binarized
+    # crop that would be handed to Tesseract. An identical crop returns
+    # the cached value without running OCR.
+    #
+    # With tolerance > 0 an exact miss also accepts a cached crop of the
+    # same shape whose pixels differ in at most that fraction of positions
+    # (compared on bit-packed images, so the scan stays cheap).
+
+    MAX_SIZE = 256
+
+    def __init__(self, max_size=MAX_SIZE, tolerance=0.0):
+        self.max_size = max_size
+        self.tolerance = tolerance
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, img):
+        digest = hashlib.blake2b(np.ascontiguousarray(img).data, digest_size=16)
+        digest.update(repr(img.shape).encode())
+        return digest.digest()
+
+    def bits(self, img):
+        return np.packbits(np.asarray(img) > 127)
+
+    def lookup(self, key, img):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            metrics.count("ocr_cache.hit")
+            return True, self.entries[key][0]
+
+        if self.tolerance > 0:
+            bits = self.bits(img)
+            limit = self.tolerance * img.size
+
+            for other, (value, shape, other_bits) in reversed(self.entries.items()):
+                if shape != img.shape:
+                    continue
+
+                diff = np.unpackbits(np.bitwise_xor(bits, other_bits)).sum()
+                if diff <= limit:
+                    self.entries.move_to_end(other)
+                    self.near_hits += 1
+                    metrics.count("ocr_cache.near_hit")
+                    return True, value
+
+        self.misses += 1
+        metrics.count("ocr_cache.miss")
+        return False, None
+
+    def store(self, key, img, value):
+        bits = self.bits(img) if self.tolerance > 0 else None
+        self.entries[key] = (value, img.shape, bits)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, img):
+        # -> (found, value, key); key goes back to put() on a miss
+        key = self.key(img)
+
+        with self.lock:
+            found, value = self.lookup(key, img)
+
+        return found, value, key
+
+    def put(self, key, img, value):
+        with self.lock:
+            self.store(key, img, value)
+
+    def get_or_compute(self, img, compute):
+        found, value, key = self.get(img)
+
+        if found:
+            return value
+
+        value = compute(img)
+        self.put(key, img, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.near_hits + self.misses
+
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,211 @@
+# outbox.py
+
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+OUTBOX_PATH = os.path.join(DATA_DIR, "outbox.jsonl")
+
+
+# -----------------------------
+# DURABLE OUTBOX
+# -----------------------------
+
+class Outbox:
+
+    # Match records waiting to be written to the sheet, one JSON line
+    # each. append() is flushed and fsynced before it returns, so a record
+    # survives a crash or a closed app; ack() rewrites the file without
+    # the delivered records. A torn last line (crash mid-append) is
+    # skipped on load.
+
+    def __init__(self, path=OUTBOX_PATH):
+        self.path = path
+        self.pending = []
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    print("[OUTBOX] Skipping unreadable entry")
+                    continue
+
+                self.pending.append(entry)
+                self.next_id = max(self.next_id, entry["id"] + 1)
+
+        if self.pending:
+            print(f"[OUTBOX] {len(self.pending)} match(es) waiting from last run")
+
+    def append(self, record):
+        with self.lock:
+            entry = {"id": self.next_id, "record": record}
+            self.next_id += 1
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.pending.append(entry)
+            return entry["id"]
+
+    def peek(self, limit):
+        with self.lock:
+            return list(self.pending[:limit])
+
+    def ack(self, entries, sheet_rows=None):
+        ids = {entry["id"] for entry in entries}
+
+        with self.lock:
+            self.pending = [entry for entry in self.pending if entry["id"] not in ids]
+            self.rewrite()
+
+    def rewrite(self):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for entry in self.pending:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp, self.path)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.pending)
+
+
+# -----------------------------
+# BACKGROUND WRITER
+# -----------------------------
+
+class SheetsWriter:
+
+    # Delivers outbox records on a background thread so the UI never waits
+    # on the network. Records go out oldest first, up to BATCH_SIZE per
+    # send_batch() call; a failed batch stays at the head of the outbox and
+    # is retried with exponential backoff (plus jitter) up to MAX_DELAY.
+    # Delivery is at-least-once: a crash between the write and the ack
+    # resends that batch on the next start.
+    #
+    # The source can be an Outbox or anything with the same append / peek
+    # / ack / len interface (MatchStore); whatever send_batch() returns
+    # (the sheet rows written) is handed to ack().
+    #
+    # on_status(text) is called from the writer thread whenever the
+    # delivery state changes.
+
+    BATCH_SIZE = 20
+    BASE_DELAY = 2.0
+    MAX_DELAY = 300.0
+
+    def __init__(self, outbox, send_batch, on_status=None):
+        self.outbox = outbox
+        self.send_batch = send_batch
+        self.on_status = on_status
+
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.failures = 0
+        self.delivered = 0
+        self.last_error = None
+        self.status = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="sheets-writer", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        self.stop_event.set()
+        self.wake.set()
+
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def submit(self, record):
+        self.outbox.append(record)
+        self.report()
+        self.wake.set()
+
+    def delay(self):
+        delay = min(self.MAX_DELAY, self.BASE_DELAY * (2 ** (self.failures - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def run(self):
+        self.report()
+
+        while not self.stop_event.is_set():
+            batch = self.outbox.peek(self.BATCH_SIZE)
+
+            if not batch:
+                self.wake.wait()
+                self.wake.clear()
+                continue
+
+            try:
+                sheet_rows = self.send_batch([entry["record"] for entry in batch])
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+
+                delay = self.delay()
+                print(f"[OUTBOX] Write failed ({e}), retry {self.failures} in {delay:.0f}s")
+                self.report(retry_in=delay)
+
+                # submit() does not cut a backoff short, stop() does
+                self.stop_event.wait(delay)
+                continue
+
+            self.outbox.ack(batch, sheet_rows)
+            self.failures = 0
+            self.last_error = None
+            self.delivered += len(batch)
+
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {len(batch)} match(es) written to sheet.")
+            self.report()
+
+    def report(self, retry_in=None):
+        pending = len(self.outbox)
+
+        if retry_in is not None:
+            status = f"Sheets: {pending} pending, retry in {retry_in:.0f}s"
+        elif pending:
+            status = f"Sheets: {pending} pending"
+        else:
+            status = "Sheets: synced"
+
+        if status != self.status:
+            self.status = status
+            if self.on_status:
+                self.on_status(status)
+
+    def stats(self):
+        return {
+            "pending": len(self.outbox),
+            "delivered": self.delivered,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,211 @@
+# phases.py
+
+import time
+from collections import deque
+from datetime import datetime
+
+
+LOBBY = "lobby"
+LOADOUT_LOCKED = "loadout_locked"
+IN_RAID = "in_raid"
+END_ROUND = "end_round"
+LOGGED = "logged"
+
+END_ROUND_TEMPLATES = ("end_round_findings", "end_round_template2", "knocked_out_by")
+
+ALL_READS = frozenset(("currency", "findings_text"))
+
+
+# -----------------------------
+# TRANSITION PREDICATES
+# -----------------------------
+
+# Each predicate carries the template names it reads, so a phase knows
+# which keys drive its transitions (the scheduler never backs those off).
+
+def watching(names, predicate):
+    predicate.names = frozenset(names)
+    return predicate
+
+
+def visible(name):
+    return watching((name,), lambda state, previous: state.get(name, False))
+
+
+def rising(name):
+    return watching((name,), lambda state, previous: state.get(name, False) and not previous.get(name, False))
+
+
+def any_visible(*names):
+    return watching(names, lambda state, previous: any(state.get(name, False) for name in names))
+
+
+def none_visible(*names):
+    return watching(names, lambda state, previous: not any(state.get(name, False) for name in names))
+
+
+def all_of(*predicates):
+    return watching(
+        frozenset().union(*(p.names for p in predicates)),
+        lambda state, previous: all(p(state, previous) for p in predicates)
+    )
+
+
+# -----------------------------
+# PHASES
+# -----------------------------
+
+class Phase:
+
+    def __init__(self, name, templates, reads, transitions, burst=()):
+        self.name = name
+        self.templates = frozenset(templates)
+        self.reads = frozenset(reads)
+        self.transitions = transitions
+        # Keys the transitions read; polled at no slower than their base
+        # interval while in this phase
+        self.watched = frozenset().union(*(predicate.names for _, predicate in transitions))
+        # Polled at high frequency right after entering the phase
+        self.burst = frozenset(burst)
+
+
+PHASES = {
+    # Loadout screen: watch the currency counter and wait for READY
+    LOBBY: Phase(
+        LOBBY,
+        templates=("currency_icon", "ready", "ready_up"),
+        reads=("currency",),
+        transitions=[
+            (LOADOUT_LOCKED, rising("ready")),
+        ],
+        burst=("ready", "currency"),
+    ),
+
+    # Readied up, loadout cost locked: either un-ready or leave the menus
+    LOADOUT_LOCKED: Phase(
+        LOADOUT_LOCKED,
+        templates=("currency_icon", "ready", "ready_up"),
+        reads=(),
+        transitions=[
+            (LOBBY, all_of(none_visible("ready"), visible("ready_up"))),
+            (IN_RAID, none_visible("ready", "ready_up", "currency_icon")),
+        ],
+        burst=("ready", "ready_up", "currency_icon"),
+    ),
+
+    # In the raid: only the end-of-round panels matter
+    IN_RAID: Phase(
+        IN_RAID,
+        templates=("currency_icon", "show_app") + END_ROUND_TEMPLATES,
+        reads=(),
+        transitions=[
+            (END_ROUND, any_visible("show_app", *END_ROUND_TEMPLATES)),
+        ],
+    ),
+
+    # End-of-round screens: read the FINDINGS value, wait for the summary.
+    # show_app is checked as a level, not an edge: when it is what ended
+    # the raid, IN_RAID has already used up its rising edge. READY stays
+    # tracked so a missed summary cannot swallow the next round.
+    END_ROUND: Phase(
+        END_ROUND,
+        templates=("currency_icon", "ready", "ready_up", "show_app") + END_ROUND_TEMPLATES,
+        reads=("currency", "findings_text"),
+        transitions=[
+            (LOGGED, visible("show_app")),
+            (LOADOUT_LOCKED, rising("ready")),
+            (LOBBY, all_of(visible("ready_up"), none_visible("show_app", *END_ROUND_TEMPLATES))),
+        ],
+        burst=("currency_icon", "end_round_findings", "show_app", "currency", "findings_text"),
+    ),
+
+    # Summary shown / match handed to the overlay: wait for the lobby
+    LOGGED: Phase(
+        LOGGED,
+        templates=("currency_icon", "ready", "ready_up", "show_app") + END_ROUND_TEMPLATES,
+        reads=("currency",),
+        transitions=[
+            (LOADOUT_LOCKED, rising("ready")),
+            (LOBBY, all_of(visible("ready_up"), none_visible("show_app", *END_ROUND_TEMPLATES))),
+        ],
+        burst=("ready", "ready_up"),
+    ),
+}
+
+
+# -----------------------------
+# LIFECYCLE
+# -----------------------------
+
+class MatchLifecycle:
+
+    # Tracks which phase of a match we are in and tells the detector which
+    # templates and OCR reads that phase needs. Every SWEEP_EVERY ticks all
+    # templates are evaluated so the phase can resync if we started
+    # mid-round or missed a transition.
+
+    SWEEP_EVERY = 20
+
+    def __init__(self, enabled=True, sweep_every=SWEEP_EVERY):
+        self.enabled = enabled
+        self.sweep_every = sweep_every
+
+        self.phase = LOBBY
+        self.entered_at = time.time()
+        self.ticks = 0
+        self.history = deque(maxlen=50)
+
+    def plan(self):
+        # -> (templates or None for all, reads, sweep)
+        self.ticks += 1
+
+        if not self.enabled:
+            return None, ALL_READS, False
+
+        if self.ticks % self.sweep_every == 0:
+            return None, PHASES[self.phase].reads, True
+
+        phase = PHASES[self.phase]
+        return phase.templates, phase.reads, False
+
+    def enter(self, target, reason):
+        previous = self.phase
+        self.phase = target
+        self.entered_at = time.time()
+        self.history.append((self.entered_at, previous, target, reason))
+
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] PHASE: {previous} -> {target} ({reason})")
+        return previous, target
+
+    def resync(self, state):
+        # Only the unambiguous cases; everything else waits for a normal
+        # transition.
+        if self.phase in (LOBBY, LOADOUT_LOCKED, IN_RAID):
+            if any(state.get(name, False) for name in END_ROUND_TEMPLATES):
+                return self.enter(END_ROUND, "resync")
+
+        if self.phase in (IN_RAID, END_ROUND):
+            if state.get("ready_up", False) and not state.get("show_app", False):
+                return self.enter(LOBBY, "resync")
+
+        return None
+
+    def advance(self, state, previous, sweep=False):
+        if sweep:
+            transition = self.resync(state)
+            if transition:
+                return transition
+
+        for target, predicate in PHASES[self.phase].transitions:
+            if predicate(state, previous):
+                return self.enter(target, "transition")
+
+        return None
+
+    def stats(self):
+        return {
+            "phase": self.phase,
+            "seconds_in_phase": time.time() - self.entered_at,
+            "ticks": self.ticks,
+            "history": list(self.history),
+        }
@@ -0,0 +1,288 @@
+# pipeline.py
+
+import threading
+import time
+from collections import deque
+
+
+# -----------------------------
+# QUEUES
+# -----------------------------
+
+class DropOldestQueue:
+
+    # Bounded hand-off between stages. When full, put() evicts the oldest
+    # item instead of blocking, so a slow downstream stage never stalls
+    # capture. on_drop(dropped, successor) lets the pipeline fold the
+    # evicted frame's work into the item that now takes its place.
+    #
+    # block=True (fast replay): put() waits for room instead, until the
+    # queue is closed.
+
+    def __init__(self, maxsize, on_drop=None, block=False):
+        self.maxsize = maxsize
+        self.on_drop = on_drop
+        self.block = block
+        self.closed = False
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self.cond:
+            while self.block and not self.closed and len(self.items) >= self.maxsize:
+                self.cond.wait()
+
+            if len(self.items) >= self.maxsize:
+                old = self.items.popleft()
+                self.dropped += 1
+
+                if self.on_drop:
+                    self.on_drop(old, self.items[0] if self.items else item)
+
+            self.items.append(item)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        with self.cond:
+            if not self.items:
+                self.cond.wait(timeout)
+
+            if not self.items:
+                return None
+
+            item = self.items.popleft()
+            self.cond.notify_all()
+            return item
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def __len__(self):
+        return len(self.items)
+
+
+class ReorderBuffer:
+
+    # Releases frames strictly in capture order. Sequence numbers of
+    # frames that were dropped (or failed) are discarded so they never
+    # hold up the frames behind them.
+
+    def __init__(self, first_seq=0):
+        self.pending = {}
+        self.discarded = set()
+        self.next_seq = first_seq
+        self.cond = threading.Condition()
+
+    def push(self, seq, item):
+        with self.cond:
+            self.pending[seq] = item
+            self.cond.notify_all()
+
+    def discard(self, seq):
+        with self.cond:
+            self.discarded.add(seq)
+            self.cond.notify_all()
+
+    def advance(self):
+        while self.next_seq in self.discarded:
+            self.discarded.remove(self.next_seq)
+            self.next_seq += 1
+
+    def pop(self, timeout=None):
+        with self.cond:
+            self.advance()
+
+            if self.next_seq not in self.pending:
+                self.cond.wait(timeout)
+                self.advance()
+
+            if self.next_seq not in self.pending:
+                return None
+
+            item = self.pending.pop(self.next_seq)
+            self.next_seq += 1
+            return item
+
+
+# -----------------------------
+# LATENCY
+# -----------------------------
+
+class LatencyStats:
+
+    # Per-stage latency from the timestamps a frame collects on its way
+    # through the detector (Frame.mark). Keeps the last WINDOW samples.
+
+    WINDOW = 256
+
+    STAGES = [
+        ("capture", "grab", "captured"),
+        ("match_queue", "captured", "match_start"),
+        ("match", "match_start", "matched"),
+        ("ocr_queue", "matched", "read_start"),
+        ("ocr", "read_start", "read"),
+        ("reduce_queue", "read", "apply_start"),
+        ("apply", "apply_start", "applied"),
+        ("total", "grab", "applied"),
+    ]
+
+    def __init__(self, window=WINDOW):
+        self.samples = {stage: deque(maxlen=window) for stage, _, _ in self.STAGES}
+        self.lock = threading.Lock()
+
+    def record(self, frame):
+        marks = frame.marks
+
+        with self.lock:
+            for stage, start, end in self.STAGES:
+                if start in marks and end in marks:
+                    self.samples[stage].append(marks[end] - marks[start])
+
+    def stats(self):
+        with self.lock:
+            result = {}
+
+            for stage, values in self.samples.items():
+                if not values:
+                    continue
+
+                ordered = sorted(values)
+                result[stage] = {
+                    "count": len(ordered),
+                    "mean_ms": sum(ordered) / len(ordered) * 1000,
+                    "p50_ms": ordered[len(ordered) // 2] * 1000,
+                    "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                    "max_ms": ordered[-1] * 1000,
+                }
+
+            return result
+
+
+# -----------------------------
+# PIPELINE
+# -----------------------------
+
+class DetectorPipeline:
+
+    # capture thread -> matcher pool -> OCR pool -> single reducer
+    #
+    # The capture thread keeps a steady cadence no matter how long OCR
+    # takes. Stages hand Frame objects along bounded drop-oldest queues;
+    # when a frame is evicted its changed regions, matches and reads are
+    # folded into the next frame so the change gate never loses an
+    # update. The reducer applies frames in capture order.
+    #
+    # lossless=True makes every stage wait instead of dropping, so a
+    # replay sees every recorded frame on the same threads as live.
+
+    QUEUE_SIZE = 2
+    POLL = 0.1
+
+    def __init__(self, detector, match_workers=2, ocr_workers=1, queue_size=QUEUE_SIZE, lossless=False):
+        self.detector = detector
+        self.match_workers = match_workers
+        self.ocr_workers = ocr_workers
+
+        self.reorder = ReorderBuffer()
+        self.match_queue = DropOldestQueue(queue_size, on_drop=self.drop_frame, block=lossless)
+        self.ocr_queue = DropOldestQueue(queue_size, on_drop=self.drop_frame, block=lossless)
+
+        self.threads = []
+        self.failures = 0
+
+    def drop_frame(self, dropped, successor):
+        successor.absorb(dropped)
+        self.reorder.discard(dropped.seq)
+
+    def start(self):
+        targets = [("capture", self.run_capture), ("reduce", self.run_reduce)]
+        targets += [(f"match-{i}", self.run_match) for i in range(self.match_workers)]
+        targets += [(f"ocr-{i}", self.run_ocr) for i in range(self.ocr_workers)]
+
+        for name, target in targets:
+            thread = threading.Thread(target=target, name=f"detector-{name}", daemon=True)
+            self.threads.append(thread)
+            thread.start()
+
+    def run_capture(self):
+        detector = self.detector
+        detector.open_match_pool()
+
+        with detector.open_frame_source() as source:
+            detector.scheduler.set_clock(source.clock)
+            print("[STARTED] Detector pipeline running...\n")
+
+            while detector.running:
+                if detector.wait_for_cooldown():
+                    continue
+
+                frame = detector.capture_frame(source)
+                if frame is None:
+                    self.drain()
+                    print("[STOPPED] Frame source exhausted")
+                    detector.running = False
+                    break
+
+                self.match_queue.put(frame)
+                detector.wait_for_next_tick(source)
+
+    def drain(self):
+        # Let every captured frame reach the reducer (or be discarded)
+        while self.detector.running and self.reorder.next_seq < self.detector.next_seq:
+            time.sleep(self.POLL)
+
+    def run_stage(self, source, stage, sink):
+        while self.detector.running:
+            frame = source.get(timeout=self.POLL)
+            if frame is None:
+                continue
+
+            try:
+                stage(frame)
+            except Exception as e:
+                self.failures += 1
+                print(f"[ERROR] Detector stage failed on frame {frame.seq}:", e)
+                self.reorder.discard(frame.seq)
+                continue
+
+            sink(frame)
+
+    def run_match(self):
+        self.run_stage(self.match_queue, self.detector.match_frame, self.ocr_queue.put)
+
+    def run_ocr(self):
+        self.run_stage(
+            self.ocr_queue,
+            self.detector.read_frame,
+            lambda frame: self.reorder.push(frame.seq, frame)
+        )
+
+    def run_reduce(self):
+        while self.detector.running:
+            frame = self.reorder.pop(timeout=self.POLL)
+            if frame is not None:
+                self.detector.apply_frame(frame)
+
+        self.match_queue.close()
+        self.ocr_queue.close()
+
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=5)
+
+        self.detector.close()
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+    def stats(self):
+        return {
+            "match_queue": len(self.match_queue),
+            "ocr_queue": len(self.ocr_queue),
+            "dropped": self.match_queue.dropped + self.ocr_queue.dropped,
+            "failures": self.failures,
+        }
@@ -0,0 +1,186 @@
+# scheduler.py
+
+import threading
+import time
+
+
+class PollScheduler:
+
+    # Per-key polling cadence for templates and OCR reads.
+    #
+    # - A key whose result did not change backs off exponentially, up to
+    #   its max interval.
+    # - Pinned keys (the ones the current phase's transitions read) never
+    #   back off past their base interval.
+    # - A change resets it to the base interval.
+    # - burst() pins keys to their min interval for BURST_SECONDS, used
+    #   around expected transitions (phase entry).
+    # - A token bucket caps the work started per second. Keys over budget
+    #   stay due and are picked up on a later tick, burst keys first.
+
+    MIN_TICK = 0.1
+    BACKOFF = 1.6
+    BURST_SECONDS = 4.0
+    WORK_BUDGET = 40.0
+
+    # key -> (min, base, max) interval in seconds
+    DEFAULT_POLICY = (0.25, 0.5, 2.0)
+    POLICIES = {
+        # Feeds the loadout cost lock, so it never backs off
+        "currency": (0.25, 0.5, 0.5),
+        "ready": (0.2, 0.5, 1.0),
+        "show_app": (0.25, 0.5, 1.0),
+    }
+
+    # Relative cost of one evaluation, charged against WORK_BUDGET
+    DEFAULT_COST = 1.0
+    COSTS = {
+        "ready": 3.0,
+        "currency": 3.0,
+        "findings_text": 10.0,
+    }
+
+    def __init__(self, enabled=True, work_budget=WORK_BUDGET):
+        self.enabled = enabled
+        self.work_budget = work_budget
+
+        self.intervals = {}
+        self.next_due = {}
+        self.burst_until = {}
+        self.active_keys = set()
+        self.pinned = frozenset()
+
+        # Replaced by the frame source's clock when the detector starts
+        self.clock = time.monotonic
+
+        self.tokens = work_budget
+        self.refilled_at = self.clock()
+
+        self.selected = 0
+        self.deferred = 0
+        self.lock = threading.Lock()
+
+    def set_clock(self, clock):
+        with self.lock:
+            self.clock = clock
+            self.next_due.clear()
+            self.burst_until.clear()
+            self.refilled_at = clock()
+
+    def policy(self, key):
+        return self.POLICIES.get(key, self.DEFAULT_POLICY)
+
+    def ceiling(self, key):
+        low, base, high = self.policy(key)
+        return base if key in self.pinned else high
+
+    def bursting(self, key, now):
+        return self.burst_until.get(key, 0) > now
+
+    def refill(self, now):
+        self.tokens = min(
+            self.work_budget,
+            self.tokens + (now - self.refilled_at) * self.work_budget
+        )
+        self.refilled_at = now
+
+    def select(self, keys, force=False):
+        # -> set of keys to evaluate this tick, or None for all of them
+        now = self.clock()
+
+        with self.lock:
+            self.active_keys = set(keys)
+            self.refill(now)
+
+            if force or not self.enabled:
+                self.selected += len(self.active_keys)
+                return None
+
+            due = [key for key in self.active_keys if self.next_due.get(key, 0) <= now]
+            due.sort(key=lambda key: (not self.bursting(key, now), self.next_due.get(key, 0)))
+
+            chosen = set()
+
+            for key in due:
+                cost = self.COSTS.get(key, self.DEFAULT_COST)
+
+                if chosen and cost > self.tokens:
+                    self.deferred += 1
+                    continue
+
+                self.tokens -= cost
+                chosen.add(key)
+
+                # Provisional, until report() sees the result
+                self.next_due[key] = now + self.intervals.get(key, self.policy(key)[1])
+
+            self.selected += len(chosen)
+            return chosen
+
+    def report(self, key, changed):
+        now = self.clock()
+
+        with self.lock:
+            low, base, high = self.policy(key)
+
+            if self.bursting(key, now):
+                interval = low
+            elif changed:
+                interval = base
+            else:
+                interval = min(self.ceiling(key), self.intervals.get(key, base) * self.BACKOFF)
+
+            self.intervals[key] = interval
+            self.next_due[key] = now + interval
+
+    def burst(self, keys, seconds=BURST_SECONDS):
+        now = self.clock()
+
+        with self.lock:
+            for key in keys:
+                self.burst_until[key] = now + seconds
+                self.intervals[key] = self.policy(key)[0]
+                self.next_due[key] = now
+
+    def pin(self, keys):
+        # Called on phase entry with the keys its transitions read. Keys
+        # that had already backed off are pulled back to base right away.
+        now = self.clock()
+
+        with self.lock:
+            self.pinned = frozenset(keys)
+
+            for key in self.pinned:
+                base = self.policy(key)[1]
+
+                if self.intervals.get(key, base) > base:
+                    self.intervals[key] = base
+                    self.next_due[key] = min(self.next_due.get(key, now), now + base)
+
+    def sleep_time(self, default):
+        if not self.enabled:
+            return default
+
+        now = self.clock()
+
+        with self.lock:
+            upcoming = [self.next_due.get(key, 0) for key in self.active_keys]
+            # Never sleep past the poll cadence while a transition is watched
+            watching = bool(self.pinned & self.active_keys)
+
+        if not upcoming:
+            return default
+
+        cap = default if watching else default * 4
+        return min(cap, max(self.MIN_TICK, min(upcoming) - now))
+
+    def stats(self):
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "selected": self.selected,
+                "deferred": self.deferred,
+                "pinned": sorted(self.pinned),
+                "tokens": self.tokens,
+                "intervals": dict(self.intervals),
+            }
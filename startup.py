@@ -0,0 +1,63 @@
+# startup.py
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from outbox import DATA_DIR
+
+
+STARTUP_LOG_PATH = os.path.join(DATA_DIR, "startup.jsonl")
+
+
+class StartupTimer:
+
+    # Startup phases in ms since process start. Phases are marked from the
+    # Tk thread and the background loader alike; save() appends the launch
+    # to data/startup.jsonl, so time-to-interactive and
+    # time-to-first-detection can be compared across releases.
+
+    def __init__(self, started_at, path=STARTUP_LOG_PATH):
+        self.started_at = started_at
+        self.path = path
+        self.phases = {}
+        self.saved = False
+        self.lock = threading.Lock()
+
+    def mark(self, phase):
+        elapsed = (time.perf_counter() - self.started_at) * 1000
+
+        with self.lock:
+            self.phases[phase] = round(elapsed, 1)
+
+        print(f"[STARTUP] {phase}: {elapsed:.0f} ms")
+        return elapsed
+
+    def save_when(self, *phases):
+        # save() once every one of phases has been marked, whichever
+        # thread marks the last of them
+        with self.lock:
+            done = all(phase in self.phases for phase in phases)
+
+        if done:
+            self.save()
+
+    def save(self):
+        with self.lock:
+            if self.saved:
+                return
+            self.saved = True
+            phases = dict(self.phases)
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "launched_at": datetime.now().isoformat(timespec="seconds"),
+                    "phases": phases,
+                }) + "\n")
+        except OSError as e:
+            print("[WARN] Could not save startup timings:", e)
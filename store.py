@@ -0,0 +1,234 @@
+# store.py
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from outbox import DATA_DIR
+
+
+STORE_PATH = os.path.join(DATA_DIR, "matches.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    logged_at TEXT NOT NULL,
+    weapon TEXT NOT NULL,
+    cost REAL NOT NULL,
+    loot_value REAL NOT NULL,
+    kills INTEGER NOT NULL,
+    initiated_fight TEXT NOT NULL,
+    notes TEXT NOT NULL DEFAULT '',
+    updated_at REAL NOT NULL,
+    synced_at REAL,
+    sheet_row INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_matches_logged_at ON matches (logged_at);
+CREATE INDEX IF NOT EXISTS idx_matches_weapon ON matches (weapon);
+CREATE INDEX IF NOT EXISTS idx_matches_cost ON matches (cost);
+CREATE INDEX IF NOT EXISTS idx_matches_loot_value ON matches (loot_value);
+CREATE INDEX IF NOT EXISTS idx_matches_kills ON matches (kills);
+CREATE INDEX IF NOT EXISTS idx_matches_initiated_fight ON matches (initiated_fight);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+FIELDS = ("logged_at", "weapon", "cost", "loot_value", "kills", "initiated_fight", "notes")
+
+
+class MatchStore:
+
+    # Local system of record for logged matches (SQLite, WAL mode). The
+    # sheet is a sync target: the store hands SheetsWriter the rows it
+    # still has to push - everything above the sheet high-water mark -
+    # using the same append / peek / ack interface as Outbox.
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Shared by the Tk thread and the sheet writer
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+
+        with self.lock:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript(SCHEMA)
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    # -----------------------------
+    # META
+    # -----------------------------
+
+    def get_meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def set_meta(self, key, value):
+        self.db.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value))
+        )
+
+    def high_water_mark(self):
+        with self.lock:
+            return int(self.get_meta("sheet_hwm", 0))
+
+    # -----------------------------
+    # MATCHES
+    # -----------------------------
+
+    def append(self, record):
+        record = dict(record)
+        record.setdefault("logged_at", datetime.now().isoformat(timespec="seconds"))
+        record.setdefault("notes", "")
+
+        with self.lock:
+            cursor = self.db.execute(
+                f"INSERT INTO matches ({', '.join(FIELDS)}, updated_at) "
+                f"VALUES ({', '.join('?' for _ in FIELDS)}, ?)",
+                [record[field] for field in FIELDS] + [time.time()]
+            )
+            self.db.commit()
+            return cursor.lastrowid
+
+    def matches(self, since=None, weapon=None, after_id=None, limit=None):
+        query = "SELECT * FROM matches WHERE 1 = 1"
+        params = []
+
+        if after_id is not None:
+            query += " AND id > ?"
+            params.append(after_id)
+
+        if since is not None:
+            query += " AND logged_at >= ?"
+            params.append(since)
+
+        if weapon is not None:
+            query += " AND weapon = ?"
+            params.append(weapon)
+
+        query += " ORDER BY id"
+
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self.lock:
+            return [dict(row) for row in self.db.execute(query, params)]
+
+    # -----------------------------
+    # SESSION
+    # -----------------------------
+
+    def reset_session(self, started_at=None):
+        started_at = started_at or datetime.now()
+
+        with self.lock:
+            self.set_meta("session_started_at", started_at.isoformat(timespec="seconds"))
+            self.db.commit()
+
+    def session_started_at(self):
+        with self.lock:
+            value = self.get_meta("session_started_at")
+
+        return datetime.fromisoformat(value) if value else None
+
+    def session_matches(self):
+        # Matches logged since the last session reset (all, if never reset)
+        started_at = self.session_started_at()
+        since = started_at.isoformat(timespec="seconds") if started_at else None
+        return self.matches(since=since)
+
+    def resume_session(self, idle_gap, now=None):
+        # The stored session continues across restarts until it has been
+        # idle for longer than idle_gap: the session is the newest run of
+        # matches with no gap above idle_gap, ending less than idle_gap
+        # ago. Otherwise a new session starts now. The start marker moves
+        # forward to match. -> (started_at, matches)
+        now = now or datetime.now()
+        matches = self.session_matches()
+
+        start = len(matches)
+        last = now
+
+        for i in range(len(matches) - 1, -1, -1):
+            logged_at = datetime.fromisoformat(matches[i]["logged_at"])
+            if last - logged_at > idle_gap:
+                break
+
+            start, last = i, logged_at
+
+        started_at = last if start < len(matches) else now
+
+        if started_at != self.session_started_at():
+            self.reset_session(started_at)
+
+        return started_at, matches[start:]
+
+    # -----------------------------
+    # SHEET SYNC (SheetsWriter source)
+    # -----------------------------
+
+    def peek(self, limit):
+        with self.lock:
+            hwm = int(self.get_meta("sheet_hwm", 0))
+            rows = self.db.execute(
+                "SELECT * FROM matches WHERE id > ? ORDER BY id LIMIT ?",
+                (hwm, limit)
+            ).fetchall()
+
+        return [{"id": row["id"], "record": {field: row[field] for field in FIELDS}} for row in rows]
+
+    def ack(self, entries, sheet_rows=None):
+        # entries as returned by peek(); sheet_rows[i] is the sheet row
+        # entries[i] was written to
+        entries = list(entries)
+        sheet_rows = sheet_rows or [None] * len(entries)
+
+        with self.lock:
+            synced_at = time.time()
+
+            for entry, sheet_row in zip(entries, sheet_rows):
+                self.db.execute(
+                    "UPDATE matches SET synced_at = ?, sheet_row = COALESCE(?, sheet_row) WHERE id = ?",
+                    (synced_at, sheet_row, entry["id"])
+                )
+
+            if entries:
+                hwm = max(int(self.get_meta("sheet_hwm", 0)), max(entry["id"] for entry in entries))
+                self.set_meta("sheet_hwm", hwm)
+
+            self.db.commit()
+
+    def __len__(self):
+        with self.lock:
+            hwm = int(self.get_meta("sheet_hwm", 0))
+            return self.db.execute(
+                "SELECT COUNT(*) FROM matches WHERE id > ?",
+                (hwm,)
+            ).fetchone()[0]
+
+    def import_outbox(self, outbox):
+        # One-time move of matches still queued in the old JSONL outbox
+        entries = outbox.peek(len(outbox))
+
+        for entry in entries:
+            self.append(entry["record"])
+
+        if entries:
+            outbox.ack(entries)
+            print(f"[STORE] Imported {len(entries)} queued match(es) from the outbox")
@@ -0,0 +1,150 @@
+# template_cache.py
+
+import hashlib
+import os
+
+import cv2
+import numpy as np
+
+from matching import TemplatePyramid
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, ".cache", "templates")
+
+# Resolution the template PNGs were cut from
+BASE_HEIGHT = 1080
+
+
+class TemplateCache:
+
+    # Grayscale templates rescaled for the current screen resolution, plus
+    # the multi-scale pyramids built from them. Prepared once and stored
+    # as .npz keyed by resolution and a hash of the template assets, so
+    # later launches load them directly.
+
+    VERSION = 1
+
+    def __init__(self, assets_dir, cache_dir=CACHE_DIR):
+        self.assets_dir = assets_dir
+        self.cache_dir = cache_dir
+
+    def asset_hash(self, templates, multi_scale):
+        digest = hashlib.blake2b(digest_size=12)
+        digest.update(f"v{self.VERSION}".encode())
+
+        for name, (filename, _) in sorted(templates.items()):
+            digest.update(f"{name}={filename}".encode())
+
+            path = os.path.join(self.assets_dir, filename)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+
+        for name, scales in sorted(multi_scale.items()):
+            digest.update(f"{name}:{list(np.round(scales, 4))}".encode())
+
+        return digest.hexdigest()
+
+    def path_for(self, screen_size, templates, multi_scale):
+        width, height = screen_size
+        key = self.asset_hash(templates, multi_scale)
+        return os.path.join(self.cache_dir, f"{width}x{height}-{key}.npz")
+
+    def load(self, templates, screen_size, multi_scale):
+        # -> ({name: gray template}, {name: TemplatePyramid})
+        path = self.path_for(screen_size, templates, multi_scale)
+
+        if os.path.exists(path):
+            try:
+                images, pyramids = self.read(path, templates, screen_size, multi_scale)
+                print(f"[INIT] Templates loaded from cache: {os.path.basename(path)}")
+                return images, pyramids
+            except Exception as e:
+                print("[WARN] Template cache unreadable, rebuilding:", e)
+
+        images, pyramids = self.build(templates, screen_size, multi_scale)
+
+        try:
+            self.write(path, images, pyramids)
+        except OSError as e:
+            print("[WARN] Could not write template cache:", e)
+
+        return images, pyramids
+
+    def build(self, templates, screen_size, multi_scale):
+        scale = screen_size[1] / BASE_HEIGHT
+        images = {}
+
+        for name, (filename, _) in templates.items():
+            path = os.path.join(self.assets_dir, filename)
+
+            if not os.path.exists(path):
+                print(f"[ERROR] Missing asset: {path}")
+                continue
+
+            img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                print(f"[ERROR] Failed to load: {filename}")
+                continue
+
+            if scale != 1.0:
+                interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+                img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=interpolation)
+
+            images[name] = img
+
+        pyramids = {
+            name: TemplatePyramid(images[name], scales, screen_scale=scale)
+            for name, scales in multi_scale.items()
+            if name in images
+        }
+
+        return images, pyramids
+
+    def write(self, path, images, pyramids):
+        arrays = {f"{name}__image": img for name, img in images.items()}
+
+        for name, pyramid in pyramids.items():
+            arrays[f"{name}__scales"] = np.array([scale for scale, _, _ in pyramid.levels])
+
+            for i, (_, full, coarse) in enumerate(pyramid.levels):
+                arrays[f"{name}__pyr{i}__full"] = full
+                if coarse is not None:
+                    arrays[f"{name}__pyr{i}__coarse"] = coarse
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+
+    def read(self, path, templates, screen_size, multi_scale):
+        scale = screen_size[1] / BASE_HEIGHT
+
+        with np.load(path, allow_pickle=False) as data:
+            images = {
+                name: data[f"{name}__image"]
+                for name in templates
+                if f"{name}__image" in data
+            }
+
+            pyramids = {}
+
+            for name in multi_scale:
+                if f"{name}__scales" not in data:
+                    continue
+
+                levels = []
+                for i, scale in enumerate(data[f"{name}__scales"]):
+                    coarse_key = f"{name}__pyr{i}__coarse"
+                    levels.append((
+                        float(scale),
+                        data[f"{name}__pyr{i}__full"],
+                        data[coarse_key] if coarse_key in data else None,
+                    ))
+
+                pyramids[name] = TemplatePyramid.from_levels(levels, screen_scale=scale)
+
+        return images, pyramids
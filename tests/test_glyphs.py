@@ -0,0 +1,83 @@
+# tests/test_glyphs.py
+
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from glyphs import GlyphBank
+
+
+def currency_crop(value, shift=0):
+    # Same preprocessing as MatchDetector.extract_currency_from_icon
+    img = np.full((26, 120), 30, dtype=np.uint8)
+    cv2.putText(img, f"{value:,}", (4 + shift, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, 230, 1, cv2.LINE_AA)
+
+    img = cv2.resize(img, None, fx=3.0, fy=3.0, interpolation=cv2.INTER_CUBIC)
+    return cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 2)
+
+
+def labeled_bank():
+    bank = GlyphBank(path=None)
+
+    for value in (1234567890, 9876543210, 5040, 13579, 24680):
+        for shift in range(3):
+            bank.learn(currency_crop(value, shift), value)
+
+    return bank
+
+
+def test_reads_labeled_values():
+    bank = labeled_bank()
+
+    assert bank.complete
+    assert bank.read(currency_crop(11111))[0] == 11111
+    assert bank.read(currency_crop(67890, 1))[0] == 67890
+
+
+def test_incomplete_bank_falls_back():
+    bank = GlyphBank(path=None)
+    bank.learn(currency_crop(1234), 1234)
+
+    assert not bank.complete
+    assert bank.read(currency_crop(1234))[0] is None
+
+
+def test_misread_label_is_rejected():
+    bank = labeled_bank()
+    glyphs = len(bank)
+
+    # "1,250" misread as 7250: the 1 already matches label 1
+    bank.learn(currency_crop(1250), 7250)
+
+    assert bank.conflicts >= 1
+    assert "7" not in bank.labels[glyphs:].tolist()
+    assert bank.read(currency_crop(11111))[0] == 11111
+    assert bank.read(currency_crop(67890))[0] == 67890
+
+
+def test_close_runner_up_needs_tesseract():
+    bank = labeled_bank()
+
+    # A 7 prototype that looks almost like the 1: the 1 still wins, but
+    # not by MIN_MARGIN
+    one = bank.vectors[bank.labels == "1"][0]
+    rng = np.random.default_rng(0)
+    fake = one + rng.normal(0, 0.01, one.shape).astype(np.float32)
+    fake -= fake.mean()
+    fake /= np.linalg.norm(fake)
+    assert float(fake @ one) > 1 - GlyphBank.MIN_MARGIN
+
+    bank.vectors = np.vstack([bank.vectors, fake[None]])
+    bank.labels = np.append(bank.labels, "7")
+    bank.index()
+
+    value, confidence = bank.read(currency_crop(11111))
+
+    assert value is None
+    assert confidence >= GlyphBank.MIN_CONFIDENCE
+    assert bank.ambiguous == 1
+    assert bank.read(currency_crop(23456))[0] == 23456
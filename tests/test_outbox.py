@@ -0,0 +1,118 @@
+# tests/test_outbox.py
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbox import Outbox, SheetsWriter
+
+
+class FakeSheet:
+
+    # Stand-in for the sheet: appends rows, fails the first `fail` calls
+    # and can "crash" (raise SystemExit in the writer) after a write
+
+    def __init__(self, fail=0):
+        self.rows = []
+        self.fail = fail
+        self.calls = 0
+        self.crash_after_write = False
+
+    def send(self, records):
+        self.calls += 1
+
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("fake network error")
+
+        self.rows.extend(record["n"] for record in records)
+
+        if self.crash_after_write:
+            self.crash_after_write = False
+            raise SystemExit("crash before ack")
+
+
+def wait_until_empty(writer, timeout=10):
+    deadline = time.monotonic() + timeout
+
+    while len(writer.outbox) and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert not len(writer.outbox), f"{len(writer.outbox)} record(s) still pending"
+
+
+def queue_offline(path, numbers):
+    # Submit while every send fails, then shut down with them queued
+    sheet = FakeSheet(fail=10 ** 9)
+    writer = SheetsWriter(Outbox(path), sheet.send)
+    writer.start()
+
+    for n in numbers:
+        writer.submit({"n": n})
+
+    writer.stop()
+    assert sheet.rows == []
+
+
+def test_delivers_in_order_after_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr(SheetsWriter, "BASE_DELAY", 0.05)
+
+    sheet = FakeSheet(fail=3)
+    writer = SheetsWriter(Outbox(str(tmp_path / "outbox.jsonl")), sheet.send)
+    writer.start()
+
+    for n in range(50):
+        writer.submit({"n": n})
+
+    wait_until_empty(writer)
+    writer.stop()
+
+    assert sheet.rows == list(range(50))
+    assert writer.failures == 0
+
+
+def test_queued_records_survive_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(SheetsWriter, "BASE_DELAY", 0.05)
+    path = str(tmp_path / "outbox.jsonl")
+
+    queue_offline(path, range(50, 60))
+    assert len(Outbox(path)) == 10
+
+    sheet = FakeSheet()
+    writer = SheetsWriter(Outbox(path), sheet.send)
+    writer.start()
+    wait_until_empty(writer)
+    writer.stop()
+
+    assert sheet.rows == list(range(50, 60))
+
+
+# The simulated crash ends the writer thread with SystemExit
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_crash_before_ack_resends_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(SheetsWriter, "BASE_DELAY", 0.05)
+    path = str(tmp_path / "outbox.jsonl")
+
+    queue_offline(path, range(50, 60))
+
+    # Written, then the writer dies before the ack: the batch stays queued
+    sheet = FakeSheet()
+    sheet.crash_after_write = True
+    writer = SheetsWriter(Outbox(path), sheet.send)
+    writer.start()
+    writer.thread.join(2)
+
+    assert sheet.rows == list(range(50, 60))
+    assert len(Outbox(path)) == 10
+
+    # At-least-once: the next start sends it again
+    writer = SheetsWriter(Outbox(path), sheet.send)
+    writer.start()
+    wait_until_empty(writer)
+    writer.stop()
+
+    assert sheet.rows == list(range(50, 60)) * 2
@@ -0,0 +1,70 @@
+# tests/test_scheduler.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phases import IN_RAID, PHASES
+from scheduler import PollScheduler
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def idle(scheduler, clock, keys, seconds, step=0.1):
+    # Nothing on screen changes; returns the longest gap between two
+    # evaluations of each key
+    last = {}
+    gaps = {key: 0.0 for key in keys}
+    end = clock.now + seconds
+
+    while clock.now < end:
+        for key in scheduler.select(keys):
+            if key in last:
+                gaps[key] = max(gaps[key], clock.now - last[key])
+            last[key] = clock.now
+            scheduler.report(key, False)
+        clock.now = round(clock.now + step, 6)
+
+    return gaps
+
+
+def test_transition_keys_stay_at_base_interval():
+    clock = FakeClock()
+    scheduler = PollScheduler()
+    scheduler.set_clock(clock)
+
+    phase = PHASES[IN_RAID]
+    scheduler.pin(phase.watched)
+
+    gaps = idle(scheduler, clock, phase.templates, 30)
+
+    for key in phase.watched:
+        assert gaps[key] <= scheduler.policy(key)[1] + 0.1, (key, gaps[key])
+
+    # Keys no transition reads still back off
+    assert gaps["currency_icon"] > scheduler.policy("currency_icon")[1] + 0.1
+
+    assert scheduler.sleep_time(0.5) <= 0.5
+
+
+def test_pin_pulls_backed_off_keys_back():
+    clock = FakeClock()
+    scheduler = PollScheduler()
+    scheduler.set_clock(clock)
+
+    keys = PHASES[IN_RAID].templates
+    idle(scheduler, clock, keys, 30)
+    assert scheduler.intervals["knocked_out_by"] > 0.5
+
+    scheduler.pin(PHASES[IN_RAID].watched)
+
+    assert scheduler.intervals["knocked_out_by"] == 0.5
+    assert scheduler.next_due["knocked_out_by"] <= clock.now + 0.5
@@ -1,10 +1,302 @@
 import tkinter as tk
 from tkinter import ttk
-from PIL import Image, ImageTk
+from collections import OrderedDict
+from PIL import Image, ImageDraw, ImageFont, ImageTk
 from logic import submit, update_stats_display
+from metrics import format_snapshot, metrics
+import hashlib
+import math
 import os
 
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(BASE_DIR, "assets")
+ASSET_CACHE_DIR = os.path.join(BASE_DIR, ".cache", "ui")
+
+
+# ================= DEBUG PANEL =================
+
+class DebugPanel:
+
+    # Live metrics (slowest timings, counters) drawn over the overlay.
+    # Nothing is built or refreshed until it is toggled on (F12), so it
+    # costs nothing while hidden.
+
+    REFRESH_MS = 1000
+    PADDING = 8
+
+    def __init__(self, root, canvas, x, y, color):
+        self.root = root
+        self.canvas = canvas
+        self.x = x
+        self.y = y
+        self.color = color
+
+        self.visible = False
+        self.box = None
+        self.text = None
+        self.pending = None
+
+    def toggle(self):
+        self.visible = not self.visible
+
+        if self.visible:
+            self.refresh()
+            return
+
+        if self.pending is not None:
+            self.root.after_cancel(self.pending)
+            self.pending = None
+
+        self.canvas.itemconfigure(self.box, state="hidden")
+        self.canvas.itemconfigure(self.text, state="hidden")
+
+    def refresh(self):
+        self.pending = None
+
+        if not self.visible:
+            return
+
+        text = format_snapshot(metrics.snapshot())
+
+        if self.text is None:
+            self.box = self.canvas.create_rectangle(0, 0, 0, 0, fill="#0d0d0d", outline=self.color)
+            self.text = self.canvas.create_text(
+                self.x, self.y,
+                text=text,
+                fill=self.color,
+                font=("Consolas", 8),
+                anchor="nw"
+            )
+        else:
+            self.canvas.itemconfigure(self.text, text=text)
+
+        self.canvas.itemconfigure(self.box, state="normal")
+        self.canvas.itemconfigure(self.text, state="normal")
+
+        x1, y1, x2, y2 = self.canvas.bbox(self.text)
+        pad = self.PADDING
+        self.canvas.coords(self.box, x1 - pad, y1 - pad, x2 + pad, y2 + pad)
+
+        self.canvas.tag_raise(self.box)
+        self.canvas.tag_raise(self.text)
+
+        self.pending = self.root.after(self.REFRESH_MS, self.refresh)
+
+
+# ================= ASSET CACHE =================
+
+def load_background(path, size, cache_dir=ASSET_CACHE_DIR):
+    # The background resized to the window, as a PhotoImage. The LANCZOS
+    # resize of the full-size PNG runs once; the result is kept as a PNG
+    # keyed by source file (size + mtime) and target size, which Tk loads
+    # directly on later launches.
+    width, height = size
+    st = os.stat(path)
+
+    key = hashlib.blake2b(
+        f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}".encode(),
+        digest_size=8
+    ).hexdigest()
+    cached = os.path.join(cache_dir, f"background_{width}x{height}-{key}.png")
+
+    if os.path.exists(cached):
+        try:
+            return tk.PhotoImage(file=cached)
+        except tk.TclError as e:
+            print("[WARN] Could not load cached background:", e)
+
+    image = Image.open(path).resize((width, height), Image.LANCZOS)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = cached + ".tmp"
+        image.save(tmp, format="PNG")
+        os.replace(tmp, cached)
+    except OSError as e:
+        print("[WARN] Could not cache background:", e)
+
+    return ImageTk.PhotoImage(image)
+
+
+# ================= PRE-RENDERED STROKE TEXT =================
+
+# Tk font (family, bold) -> TrueType file in the Windows font folder
+FONT_FILES = {
+    ("Segoe UI", False): "segoeui.ttf",
+    ("Segoe UI", True): "segoeuib.ttf",
+    ("Consolas", False): "consola.ttf",
+    ("Consolas", True): "consolab.ttf",
+}
+
+
+class StrokeTextRenderer:
+
+    # Renders outlined text once into an RGBA image (PIL stroke) instead of
+    # drawing the text at every (dx, dy) offset as separate canvas items.
+    # Images are cached by (text, font, stroke, color) with LRU eviction.
+    # render() returns None when the font file cannot be found, and the
+    # caller falls back to canvas text.
+
+    MAX_SIZE = 64
+
+    def __init__(self, root, max_size=MAX_SIZE):
+        self.root = root
+        self.max_size = max_size
+        # Tk font sizes are points; PIL wants pixels
+        self.scaling = float(root.tk.call("tk", "scaling"))
+        self.fonts = {}
+        self.images = OrderedDict()
+
+    def load_font(self, font):
+        family, size = font[0], font[1]
+        bold = "bold" in font[2:]
+
+        key = (family, size, bold)
+        if key in self.fonts:
+            return self.fonts[key]
+
+        # Negative Tk sizes are already pixels
+        pixels = round(size * self.scaling) if size > 0 else -size
+
+        loaded = None
+        filename = FONT_FILES.get((family, bold))
+
+        if filename:
+            fonts_dir = os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts")
+
+            for candidate in (os.path.join(fonts_dir, filename), filename):
+                try:
+                    loaded = ImageFont.truetype(candidate, pixels)
+                    break
+                except OSError:
+                    continue
+
+        self.fonts[key] = loaded
+        return loaded
+
+    def render(self, text, font, stroke, color):
+        key = (text, font, stroke, color)
+
+        photo = self.images.get(key)
+        if photo is not None:
+            self.images.move_to_end(key)
+            return photo
+
+        pil_font = self.load_font(font)
+        if pil_font is None:
+            return None
+
+        # Same line height as Tk (ascent + descent, no extra spacing)
+        ascent, descent = pil_font.getmetrics()
+        line_height = ascent + descent
+        lines = text.split("\n")
+
+        width = max(pil_font.getlength(line) for line in lines)
+        image = Image.new(
+            "RGBA",
+            (max(1, math.ceil(width) + 2 * stroke), line_height * len(lines) + 2 * stroke),
+            (0, 0, 0, 0)
+        )
+
+        draw = ImageDraw.Draw(image)
+        for i, line in enumerate(lines):
+            draw.text(
+                (stroke, stroke + i * line_height),
+                line,
+                font=pil_font,
+                fill=color,
+                stroke_width=stroke,
+                stroke_fill="black"
+            )
+
+        photo = ImageTk.PhotoImage(image, master=self.root)
+
+        self.images[key] = photo
+        while len(self.images) > self.max_size:
+            self.images.popitem(last=False)
+
+        return photo
+
+
+class StrokeLabel:
+
+    # One outlined text label on the canvas: a single image item that
+    # set() re-points at another cached image. Keeps a reference to the
+    # image it shows, so LRU eviction never blanks a visible label.
+
+    def __init__(self, canvas, renderer, x, y, font, color, anchor="w", stroke=4):
+        self.canvas = canvas
+        self.renderer = renderer
+        self.x = x
+        self.y = y
+        self.font = font
+        self.color = color
+        self.anchor = anchor
+        self.stroke = stroke
+
+        self.item = None
+        self.photo = None
+        self.tag = f"stroke_label_{id(self)}"
+
+    def image_position(self):
+        # The image carries `stroke` pixels of outline on every side
+        x, y = self.x, self.y
+
+        if "w" in self.anchor:
+            x -= self.stroke
+        elif "e" in self.anchor:
+            x += self.stroke
+
+        if "n" in self.anchor:
+            y -= self.stroke
+        elif "s" in self.anchor:
+            y += self.stroke
+
+        return x, y
+
+    def set(self, text):
+        photo = self.renderer.render(text, self.font, self.stroke, self.color)
+
+        if photo is None:
+            self.draw_items(text)
+            return
+
+        self.photo = photo
+
+        if self.item is None:
+            x, y = self.image_position()
+            self.item = self.canvas.create_image(x, y, image=photo, anchor=self.anchor)
+        else:
+            self.canvas.itemconfigure(self.item, image=photo)
+
+    def draw_items(self, text):
+        # Fallback without the font file: outline from offset canvas texts
+        self.canvas.delete(self.tag)
+        stroke = self.stroke
+
+        for dx in range(-stroke, stroke + 1):
+            for dy in range(-stroke, stroke + 1):
+                if dx != 0 or dy != 0:
+                    self.canvas.create_text(
+                        self.x + dx, self.y + dy,
+                        text=text,
+                        fill="black",
+                        font=self.font,
+                        anchor=self.anchor,
+                        tags=self.tag
+                    )
+
+        self.item = self.canvas.create_text(
+            self.x, self.y,
+            text=text,
+            fill=self.color,
+            font=self.font,
+            anchor=self.anchor,
+            tags=self.tag
+        )
+
+
 def build_ui(root, toggle_window):
     root.title("ARC Match Logger")
 
@@ -26,14 +318,9 @@ def build_ui(root, toggle_window):
     canvas = tk.Canvas(root, highlightthickness=0)
     canvas.pack(fill="both", expand=True)
 
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    ASSETS_DIR = os.path.join(BASE_DIR, "assets")
     bg_path = os.path.join(ASSETS_DIR, "background_origin.png")
 
-    bg_image = Image.open(bg_path)
-    bg_image = bg_image.resize((window_width, window_height), Image.LANCZOS)
-
-    bg_photo = ImageTk.PhotoImage(bg_image)
+    bg_photo = load_background(bg_path, (window_width, window_height))
     canvas.bg_photo = bg_photo
     canvas.create_image(0, 0, image=bg_photo, anchor="nw")
 
@@ -108,25 +395,12 @@ def build_ui(root, toggle_window):
 
     # ================= STROKE TEXT =================
 
-    def create_stroke_text(x, y, text, font, anchor="w", stroke=4):
-        for dx in range(-stroke, stroke + 1):
-            for dy in range(-stroke, stroke + 1):
-                if dx != 0 or dy != 0:
-                    canvas.create_text(
-                        x + dx, y + dy,
-                        text=text,
-                        fill="black",
-                        font=font,
-                        anchor=anchor
-                    )
+    stroke_renderer = StrokeTextRenderer(root)
 
-        return canvas.create_text(
-            x, y,
-            text=text,
-            fill=neon,
-            font=font,
-            anchor=anchor
-        )
+    def create_stroke_text(x, y, text, font, anchor="w", stroke=4):
+        label = StrokeLabel(canvas, stroke_renderer, x, y, font, neon, anchor=anchor, stroke=stroke)
+        label.set(text)
+        return label
 
     def create_label(x, y, text):
         create_stroke_text(x, y, text, font_label, anchor="w", stroke=4)
@@ -259,43 +533,37 @@ def build_ui(root, toggle_window):
     # ================= CENTER STATS =================
 
     stats_text = tk.StringVar()
-    stats_items = []
 
-    def draw_stats_text(text):
-        for item in stats_items:
-            canvas.delete(item)
-        stats_items.clear()
+    stats_label = StrokeLabel(
+        canvas, stroke_renderer,
+        300, 30,
+        ("Consolas", 18, "bold"),
+        neon,
+        anchor="nw",
+        stroke=4
+    )
 
-        x = 300
-        y = 30
-        stroke = 4
-        stroke_color = "black"
+    def update_canvas_stats(*args):
+        stats_label.set(stats_text.get())
 
-        for dx in range(-stroke, stroke + 1):
-            for dy in range(-stroke, stroke + 1):
-                if dx != 0 or dy != 0:
-                    item = canvas.create_text(
-                        x + dx, y + dy,
-                        text=text,
-                        fill=stroke_color,
-                        font=("Consolas", 18, "bold"),
-                        anchor="nw"
-                    )
-                    stats_items.append(item)
+    stats_text.trace_add("write", update_canvas_stats)
 
-        main_item = canvas.create_text(
-            x, y,
-            text=text,
-            fill=neon,
-            font=("Consolas", 18, "bold"),
-            anchor="nw"
-        )
-        stats_items.append(main_item)
+    # ================= SHEET SYNC STATUS =================
 
-    def update_canvas_stats(*args):
-        draw_stats_text(stats_text.get())
+    sync_text = tk.StringVar()
 
-    stats_text.trace_add("write", update_canvas_stats)
+    sync_label = StrokeLabel(
+        canvas, stroke_renderer,
+        left_x, 330,
+        ("Segoe UI", 12, "bold"),
+        neon,
+        stroke=2
+    )
+
+    def update_sync_status(*args):
+        sync_label.set(sync_text.get())
+
+    sync_text.trace_add("write", update_sync_status)
 
     # ================= BUTTONS =================
 
@@ -339,6 +607,11 @@ def build_ui(root, toggle_window):
         )
     )
 
+    # ================= DEBUG PANEL =================
+
+    debug_panel = DebugPanel(root, canvas, 300, 20, neon)
+    root.bind("<F12>", lambda e: debug_panel.toggle())
+
     update_stats_display(stats_text)
 
-    return cost_entry, loot_entry, kills_entry, stats_text
\ No newline at end of file
+    return cost_entry, loot_entry, kills_entry, stats_text, sync_text
\ No newline at end of file